@@ -4,9 +4,11 @@ import pygame
 import sys
 import os
 import argparse
+import json
 from src.game.game_engine import GameEngine
 from src.utils.config import load_config
 from src.ai.ai_trainer import AITrainer
+from src.game.map_corpus import MapCorpus
 
 # Create necessary directories
 def ensure_directories():
@@ -46,6 +48,16 @@ def parse_arguments():
     parser.add_argument('--show-path', action='store_true', help='Show AI path visualization')
     parser.add_argument('--train', action='store_true', help='Run AI training session')
     parser.add_argument('--episodes', type=int, default=100, help='Number of training episodes')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible maps and training')
+    parser.add_argument('--render-mode', choices=['full', 'dirty'], default=None,
+                        help='Redraw the full screen or only changed areas each frame')
+    parser.add_argument('--corpus', type=str, default=None, help='Map corpus file to train on (built if missing)')
+    parser.add_argument('--profile-frames', nargs='?', const='frame_trace.json', default=None, metavar='PATH',
+                        help='Time each frame phase and write a Chrome trace (default: frame_trace.json)')
+    parser.add_argument('--headless', action='store_true', help='Run one simulation without a display')
+    parser.add_argument('--ticks', type=int, default=100000, help='Maximum simulation steps in headless mode')
+    parser.add_argument('--cameras', type=str, default=None,
+                        help='JSON file with a list of [x, y, direction] cameras for headless mode')
     return parser.parse_args()
 
 def main():
@@ -58,6 +70,13 @@ def main():
     config["map_size"] = args.map_size or 30  # Default to larger 30x30 map
     config["use_mock_prolog"] = args.use_mock_prolog if hasattr(args, 'use_mock_prolog') else True
     config["show_path"] = args.show_path if hasattr(args, 'show_path') else True
+    if args.render_mode:
+        config["render_mode"] = args.render_mode
+    if args.profile_frames:
+        config["profile_frames"] = args.profile_frames
+    if args.seed is not None:
+        config["map_seed"] = args.seed
+        config["training_seed"] = args.seed
 
     # Game settings
     config["cell_size"] = 25  # Slightly smaller cells to fit the larger map on screen
@@ -74,10 +93,30 @@ def main():
     if args.train:
         print(f"Starting AI training session with {args.episodes} episodes...")
         trainer = AITrainer(config)
-        trainer.train_ai_offline(num_episodes=args.episodes)
+        corpus = None
+        if args.corpus:
+            if os.path.exists(args.corpus):
+                corpus = MapCorpus(args.corpus)
+            else:
+                print(f"Building map corpus {args.corpus}...")
+                corpus = MapCorpus.build(args.corpus, config, max(1, args.episodes // 100),
+                                         first_seed=args.seed or 0)
+        trainer.train_ai_offline(num_episodes=args.episodes, corpus=corpus)
         print("Training completed!")
         return
 
+    # Run a simulation without a window, stepping simulated time
+    if args.headless:
+        game = GameEngine(config, headless=True)
+        if args.cameras:
+            with open(args.cameras, 'r') as f:
+                placed = game.place_cameras(json.load(f))
+            print(f"Placed {placed} cameras")
+        summary = game.run_headless(max_ticks=args.ticks)
+        print(f"Result: {summary['result'] or 'timeout'} after {summary['ticks']} ticks "
+              f"({summary['sim_time']:.1f}s simulated)")
+        return
+
     # Run the game
     try:
         pygame.init()
@@ -1,6 +1,7 @@
 """ Advanced Adaptive AI that learns from player behavior and adapts strategies. """ 
 from src.ai.reinforcement_learning import RLAgent
 import random
+import numpy as np
 import json
 import os
 from collections import defaultdict
@@ -175,21 +176,15 @@ class AdaptiveAI(RLAgent):
 
     def identify_surveillance_blind_spots(self, game_map):
         """Phát hiện điểm mù trong hệ thống giám sát"""
-        blind_spots = []
-        camera_coverage = set()
-        
-        # Thu thập vùng phủ sóng của tất cả camera
+        # Thu thập vùng phủ sóng của tất cả camera đang quét
+        camera_coverage = np.zeros((game_map.size, game_map.size), dtype=bool)
         for camera in game_map.cameras:
-            for x in range(game_map.size):
-                for y in range(game_map.size):
-                    if game_map.grid[x][y] == 0 and camera.can_see(x, y, game_map):
-                        camera_coverage.add((x, y))
+            if camera.active:
+                camera_coverage |= camera.get_visibility_mask(game_map)
         
         # Tìm điểm mù (các ô đường đi không bị phát hiện)
-        for x in range(game_map.size):
-            for y in range(game_map.size):
-                if game_map.grid[x][y] == 0 and (x, y) not in camera_coverage:
-                    blind_spots.append((x, y))
+        street = game_map.grid == 0
+        blind_spots = [(int(x), int(y)) for x, y in np.argwhere(street & ~camera_coverage)]
         
         # Tăng giá trị Q cho các đường đi qua điểm mù
         for spot in blind_spots:
@@ -6,6 +6,7 @@ import time
 from src.ai.adaptive_ai import AdaptiveAI
 from src.prolog_interface.prolog_connector import PrologConnector
 from src.game.map import GameMap
+from src.game.pathfinding import astar, min_exposure_path, path_exposure
 
 class AITrainer:
     def __init__(self, config):
@@ -13,18 +14,28 @@ class AITrainer:
         self.config = config
         self.prolog = PrologConnector(use_mock=config.get("use_mock_prolog", True))
         self.prolog.load_knowledge_base()
+        # Seed for reproducible training runs; None keeps them random
+        self.training_seed = config.get("training_seed")
+        self.maps_generated = 0
         
-    def generate_random_map(self, size=None, variation=10):
-        """Generate a random map for training."""
+    def generate_random_map(self, size=None, variation=10, seed=None):
+        """Generate a random map for training.
+
+        With a training seed, maps cycle through `variation` seeds so that
+        repeated runs reuse the same (cached) maps.
+        """
         if size is None:
             size = self.config.get("map_size", 30)
+        if seed is None and self.training_seed is not None:
+            seed = self.training_seed + self.maps_generated % max(1, variation)
+        self.maps_generated += 1
             
         # Tạo cấu hình tạm thời
         temp_config = self.config.copy()
         temp_config["map_size"] = size
         
         # Tạo bản đồ mới
-        game_map = GameMap(temp_config)
+        game_map = GameMap(temp_config, seed=seed)
         return game_map
         
     def generate_random_camera_placement(self, game_map, num_cameras=None):
@@ -83,15 +94,13 @@ class AITrainer:
                 new_pos = ai.path[ai.path_index]
                 
                 # Kiểm tra nếu bị camera phát hiện
-                for camera in game_map.cameras:
-                    if camera.active and camera.can_see(new_pos[0], new_pos[1], game_map):
-                        ai.captured = True
-                        # Cập nhật Q-table với phần thưởng tiêu cực
-                        state = (f"pos_{ai.pos[0]}_{ai.pos[1]}", "undetected")
-                        action = f"move_to_{new_pos[0]}_{new_pos[1]}"
-                        next_state = (f"pos_{new_pos[0]}_{new_pos[1]}", "detected")
-                        ai.update_q_value(state, action, -10.0, next_state)
-                        break
+                if game_map.is_covered(new_pos[0], new_pos[1]):
+                    ai.captured = True
+                    # Cập nhật Q-table với phần thưởng tiêu cực
+                    state = (f"pos_{ai.pos[0]}_{ai.pos[1]}", "undetected")
+                    action = f"move_to_{new_pos[0]}_{new_pos[1]}"
+                    next_state = (f"pos_{new_pos[0]}_{new_pos[1]}", "detected")
+                    ai.update_q_value(state, action, -10.0, next_state)
                 
                 # Nếu không bị phát hiện, tiếp tục di chuyển
                 if not ai.captured:
@@ -128,40 +137,38 @@ class AITrainer:
             "escaped": ai.escaped,
             "captured": ai.captured,
             "steps": steps,
-            "path_length": len(ai.path) if ai.path else 0
+            "path_length": len(ai.path) if ai.path else 0,
+            "exposure": self.get_route_exposure(game_map)
         }
         
         return result
         
     def find_path_bfs(self, ai, game_map):
-        """Find a path using BFS algorithm."""
-        start = game_map.start_pos
-        goals = game_map.end_positions
-        
-        # Standard BFS implementation
-        queue = [(start, [])]
-        visited = {start}
-        
-        while queue:
-            (x, y), path = queue.pop(0)
-            
-            # Check if we reached any goal
-            if (x, y) in goals:
-                return path + [(x, y)]
-            
-            # Check all four directions
-            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                if (0 <= nx < game_map.size and 0 <= ny < game_map.size and 
-                    game_map.grid[nx][ny] == 0 and (nx, ny) not in visited):
-                    queue.append(((nx, ny), path + [(x, y)]))
-                    visited.add((nx, ny))
-        
-        # No path found
-        return []
-        
-    def train_ai_offline(self, num_episodes=1000, maps_variation=10):
-        """Train AI through multiple episodes with varying maps."""
+        """Find a shortest path from the start to an exit using A*."""
+        return astar(game_map.grid == 0, game_map.start_pos, game_map.end_positions)
+        
+    def get_route_exposure(self, game_map):
+        """Graded difficulty of a camera layout: camera-watched steps on the least-exposed route."""
+        path = min_exposure_path(
+            game_map.grid == 0,
+            game_map.coverage,
+            game_map.start_pos,
+            game_map.end_positions,
+            self.config.get("exposure_weight", 10)
+        )
+        return path_exposure(game_map.coverage, path) if path else None
+
+    def train_ai_offline(self, num_episodes=1000, maps_variation=10, corpus=None):
+        """Train AI through multiple episodes with varying maps.
+
+        If a MapCorpus is given, maps are taken from it in turn instead of
+        being generated.
+        """
+        if self.training_seed is not None:
+            # Camera placement and exploration draw from the global random module
+            random.seed(self.training_seed)
+            self.maps_generated = 0
+
         print("Khởi tạo AI Agent cho huấn luyện...")
         ai_agent = AdaptiveAI(self.prolog)
         
@@ -178,7 +185,10 @@ class AITrainer:
             # Tạo bản đồ mới định kỳ
             if episode % 100 == 0:
                 print(f"Tập {episode}/{num_episodes}: Tạo bản đồ mới...")
-                game_map = self.generate_random_map(variation=maps_variation)
+                if corpus is not None and len(corpus):
+                    game_map = corpus.load_map((episode // 100) % len(corpus), self.config)
+                else:
+                    game_map = self.generate_random_map(variation=maps_variation)
                 
             # Đặt camera ngẫu nhiên
             if episode % 10 == 0:
@@ -1,15 +1,170 @@
 import pygame
 import numpy as np
-from collections import deque
-from src.utils.gif_loader import AnimatedSprite
+from src.utils.gif_loader import AnimatedSprite, download_gif
+from src.utils.asset_cache import get_asset_cache
+from src.game.pathfinding import astar, distance_field, min_exposure_path, space_time_search, DStarLite
 import os
+from concurrent.futures import ThreadPoolExecutor
+from src.game.hpa import ClusterGraph
+from src.game.junction_graph import JunctionGraph, worth_contracting
+from src.game.map import coverage_phases
+from src.utils.frame_profiler import profile
+
+# One worker thread plans paths in the background for the game window
+_planning_pool = None
+
+def get_planning_pool():
+    """Return the shared path planning executor, creating it on first use."""
+    global _planning_pool
+    if _planning_pool is None:
+        _planning_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="path-planner")
+    return _planning_pool
+
+class PlanRequest:
+    """Copy of everything a path search needs, taken on the main thread.
+
+    For a background search (background=True) nothing in the request is
+    shared with the map: the cluster and junction graphs are private
+    copies, or left for the worker to build, and the worker also sets up
+    the incremental planner and predicts the camera phases for a timed
+    search. The game can then keep changing the map while it runs.
+    """
+
+    def __init__(self, agent, background=False):
+        game_map = agent.game_map
+        # Placing or rotating a camera makes a pending plan stale
+        self.key = (game_map.grid_version, game_map.layout_version)
+        self.grid_version = game_map.grid_version
+        self.coverage_version = game_map.coverage_version
+        self.start = agent.pos
+        self.exits = list(game_map.end_positions)
+        self.street = game_map.grid == 0
+        self.coverage = game_map.coverage.copy()
+        self.exposure_weight = agent.config.get("exposure_weight", 10)
+        self.background = background
+
+        # Camera cycles as of submit_time, the moment a timed plan starts from
+        self.timed = agent.config.get("path_mode") == "timed"
+        self.submit_time = game_map.clock.now()
+        self.step_time = 1.0 / agent.speed
+        self.schedules = game_map.camera_schedules(self.submit_time) if self.timed else []
+        self.phases = None
+        self.period = None
+        if self.timed and not background:
+            # Planned right away, so only set up another search if this one cannot run
+            self.phases, self.period = coverage_phases(self.schedules, game_map.size, self.step_time)
+
+        self.cluster_graph = None
+        self.cluster_size = agent.config.get("hpa_cluster_size", 16)
+        self.junction_graph = None
+        self.use_junctions = False
+        self.anchors = [game_map.start_pos] + self.exits
+        if self.phases is not None:
+            self.mode = "timed"
+        elif agent._uses_hierarchy():
+            self.mode = "hierarchical"
+            if background:
+                # Building the graph is slow on big maps, so that is left to the worker
+                graph = game_map.get_cluster_graph(build=False)
+                self.cluster_graph = graph.copy() if graph is not None else None
+            else:
+                self.cluster_graph = game_map.get_cluster_graph()
+        else:
+            self.mode = "astar"
+            # Long corridors are searched as single edges of the junction graph
+            self.use_junctions = worth_contracting(self.street)
+            if self.use_junctions:
+                if background:
+                    graph = game_map.get_junction_graph(build=False)
+                    self.junction_graph = graph.copy() if graph is not None else None
+                else:
+                    self.junction_graph = game_map.get_junction_graph()
+
+def plan_path(request):
+    """Search for a path to an exit from a PlanRequest.
+
+    Returns a dict with the path, whether it avoids every camera, the
+    generator of hierarchical segments still to refine (or None), the kind
+    of search, the predicted camera phases and their period in steps
+    (None if it is not whole), the cluster and junction graphs that were
+    used and, for background A* searches, the incremental planner set up for
+    the snapshot.
+    """
+    result = {"path": [], "segments": None, "graph": request.cluster_graph,
+              "junction_graph": request.junction_graph, "mode": request.mode,
+              "phases": request.phases, "period": request.period, "hidden": False, "planner": None}
+    if not request.exits:
+        print("No exit positions found")
+        return result
+
+    if request.timed and request.background:
+        # Predicting every step of the camera cycle is left to the worker
+        result["phases"], result["period"] = coverage_phases(
+            request.schedules, len(request.street), request.step_time
+        )
+        if result["phases"] is not None:
+            result["mode"] = "timed"
+
+    passable = request.street & (request.coverage == 0)
+    path = []
+    if result["mode"] == "timed":
+        # Search over (x, y, time) to slip past cameras while they rest
+        path = space_time_search(request.street, result["phases"], request.start, request.exits)
+    elif request.mode == "hierarchical":
+        graph = request.cluster_graph
+        if graph is None:
+            graph = ClusterGraph(passable, request.cluster_size)
+            result["graph"] = graph
+        waypoints = graph.find_path(request.start, request.exits)
+        if waypoints:
+            # Refine only the first segment now, the rest as the agent walks
+            segments = graph.refine(waypoints)
+            path = [request.start]
+            path.extend(next(segments, []))
+            result["segments"] = segments
+    else:
+        if request.use_junctions:
+            # A* over the corridors between junctions that no active camera can see
+            graph = request.junction_graph
+            if graph is None:
+                graph = JunctionGraph(np.where(request.street, 0, 1), request.anchors)
+                result["junction_graph"] = graph
+            path = graph.shortest_path(request.start, request.exits, passable)
+        else:
+            # A* over street cells that no active camera can see
+            path = astar(passable, request.start, request.exits)
+        if request.background:
+            # Seeding the incremental planner walks the whole grid; keep it off the UI thread
+            result["planner"] = DStarLite(
+                passable, request.exits, request.start,
+                distances=distance_field(passable, request.exits)
+            )
+    if path:
+        print(f"Path found with length {len(path)}")
+        result["path"] = path
+        result["hidden"] = True
+        return result
+
+    # Every route is watched, so take the one spending least time in view
+    result["segments"] = None
+    result["path"] = min_exposure_path(
+        request.street, request.coverage, request.start, request.exits, request.exposure_weight
+    )
+    if result["path"]:
+        print(f"No hidden path, least-exposed path has length {len(result['path'])}")
+    else:
+        print("No path found")
+    return result
 
 class AIAgent:
-    """AI agent that uses BFS to find paths and avoid camera detection."""
+    """AI agent that uses A* to find paths and avoid camera detection."""
 
-    def __init__(self, game_map, config):
+    def __init__(self, game_map, config, clock=None, load_sprite=True):
         self.game_map = game_map
         self.config = config
+        # Same time source as the map unless one is given
+        self.clock = clock if clock is not None else game_map.clock
+        self.last_update = self.clock.now()
         self.cell_size = config["cell_size"]
         self.pos = game_map.start_pos if game_map.start_pos else (1, 1)
         self.path = []
@@ -18,17 +173,38 @@ class AIAgent:
         self.speed = 5  # Cells per second
         self.move_progress = 0
         self.captured = False
+        self.captured_by = []  # Cameras that saw the agent when it was caught
         self.escaped = False
 
-        # Load animated sprite for the agent
-        gif_url = "https://piskel-imgstore-b.appspot.com/img/55430b28-0ea0-11f0-b38e-bfefe72123d5.gif"
-        # Reduce size to 10 times (instead of 50 times)
-        sprite_size = (10 * (self.cell_size - 4), 3 * (self.cell_size - 4))
-        self.sprite = self._load_agent_sprite(gif_url, sprite_size)
+        # Incremental planner repaired whenever the camera coverage changes
+        self.planner = None
+        self._planner_key = None
+        # Hierarchical path segments still waiting to be refined
+        self._path_segments = None
+        self._plan_mode = None  # Kind of search that produced the current path
+        self.path_hidden = False  # Whether that path avoids every camera
+        self._timed_fallback_logged = False
+        # Path search running on the planning worker, if any
+        self.planning = False
+        self._plan_future = None
+        self._plan_request = None
+        # Areas last reported as drawn, for dirty-rect rendering
+        self._drawn_sprite_rect = None
+        self._drawn_path_key = None
+        self._drawn_path_rect = None
+
+        # Headless simulations never draw the agent, so they skip the sprite
+        self.sprite = None
+        if load_sprite:
+            # Load animated sprite for the agent
+            gif_url = "https://piskel-imgstore-b.appspot.com/img/55430b28-0ea0-11f0-b38e-bfefe72123d5.gif"
+            # Reduce size to 10 times (instead of 50 times)
+            sprite_size = (10 * (self.cell_size - 4), 3 * (self.cell_size - 4))
+            self.sprite = self._load_agent_sprite(gif_url, sprite_size)
 
-        # For debugging
-        print(f"Loaded sprite frames: {len(self.sprite.frames) if self.sprite else 0}")
-        print(f"AI agent sprite size: {sprite_size}")
+            # For debugging
+            print(f"Loaded sprite frames: {len(self.sprite.frames) if self.sprite else 0}")
+            print(f"AI agent sprite size: {sprite_size}")
 
     def _load_agent_sprite(self, url, size):
         """Load the agent sprite from URL or local cache"""
@@ -41,13 +217,15 @@ class AIAgent:
             cache_file = os.path.join(cache_dir, "agent_sprite.gif")
             print(f"Loading sprite from: {cache_file if os.path.exists(cache_file) else url}")
 
-            # Try to load from cache first, if not available download from URL
-            if os.path.exists(cache_file):
-                sprite = AnimatedSprite.from_file(cache_file, size)
-            else:
-                sprite = AnimatedSprite.from_url(url, size, save_path=cache_file)
+            # Download only if there is no local copy yet
+            if not os.path.exists(cache_file):
+                download_gif(url, save_path=cache_file)
                 print(f"Downloaded sprite to: {cache_file}")
 
+            # Decoded and scaled frames are shared by every agent of this size
+            frames, durations = get_asset_cache().load_sprite_frames(cache_file, size)
+            sprite = AnimatedSprite(frames, durations)
+
             # If sprite loading failed, create a fallback sprite
             if not sprite.frames:
                 print("Sprite loading failed, creating fallback")
@@ -66,14 +244,113 @@ class AIAgent:
             surf.fill(self.config["colors"]["ai"])
             return AnimatedSprite(frames=[surf], durations=[100])
 
-    def start_movement(self):
-        """Start the AI movement by calculating a path."""
-        self.is_moving = True
+    def start_movement(self, background=False):
+        """Start the AI movement by calculating a path.
+
+        With background=True the search runs on the planning worker and the
+        agent waits in the planning state until update() picks up the path.
+        """
         self.captured = False
+        self.captured_by = []
         self.escaped = False
         self.path_index = 0
         self.move_progress = 0
-        self.path = self.find_path_bfs()
+        if background:
+            self._submit_plan()
+            return
+
+        self.is_moving = True
+        with profile("path_planning"):
+            self.path = self.find_path_bfs()
+        self._start_following()
+
+    def _submit_plan(self):
+        """Hand a snapshot of the map to the planning worker."""
+        self.cancel_planning()
+        with profile("path_planning"):
+            self._plan_request = PlanRequest(self, background=True)
+        self._plan_future = get_planning_pool().submit(plan_path, self._plan_request)
+        self.planning = True
+        self.is_moving = False
+
+    def cancel_planning(self):
+        """Drop the pending background plan; a search already running is ignored when it ends."""
+        if self._plan_future is not None:
+            self._plan_future.cancel()
+        self._plan_future = None
+        self._plan_request = None
+        self.planning = False
+
+    def _poll_plan(self, time):
+        """Start moving once the background plan is ready; re-plan if it went stale.
+
+        time is the clock time the agent's movement has been counted up to.
+        """
+        request = self._plan_request
+        if request.key != (self.game_map.grid_version, self.game_map.layout_version):
+            # A camera was placed or rotated since the snapshot
+            self._submit_plan()
+            return
+        if not self._plan_future.done():
+            return
+
+        result = self._plan_future.result()
+        self._plan_future = None
+        self._plan_request = None
+        self.planning = False
+        if result["graph"] is not None:
+            self.game_map.adopt_cluster_graph(result["graph"], request.grid_version)
+        if result["junction_graph"] is not None:
+            self.game_map.adopt_junction_graph(result["junction_graph"], request.grid_version)
+        self.path = result["path"]
+        self._take_plan(result)
+        if self._plan_mode == "timed" and self.path_hidden and not self._align_schedule(request, result, time):
+            # The start is watched while waiting for the schedule to come round
+            self._submit_plan()
+            return
+        self.is_moving = True
+        if result["planner"] is not None:
+            self.planner = result["planner"]
+            self._planner_key = (request.grid_version, request.coverage_version)
+        else:
+            self._start_following()
+        if self._planner_key is not None:
+            # Cameras may have switched while planning; the next tick repairs the plan
+            self._planner_key = (request.grid_version, request.coverage_version)
+
+    def _align_schedule(self, request, result, time):
+        """Shift a timed path to the camera cycle it was planned against.
+
+        The schedule starts at submit time, but the agent waited at its start
+        while the worker ran. The cameras repeat every period steps, so the
+        agent keeps waiting until the first whole period after submitting and
+        follows the schedule from there. Returns False, leaving the path
+        unused, if a camera sees the start during that wait.
+        """
+        period = result["period"]
+        elapsed = (time - request.submit_time) / request.step_time
+        done = max(0, int(elapsed))  # Steps already spent at the start
+        begin = -(-done // period) * period
+        x, y = self.pos
+        watched = np.unpackbits(result["phases"][:, x, y // 8])[y % 8::8]
+        if any(watched[t % period] for t in range(done, begin + 1)):
+            return False
+
+        self.path = [self.pos] * (begin - done) + self.path
+        self.path_index = 1 if len(self.path) > 1 else 0
+        self.move_progress = max(0.0, elapsed - done)
+        return True
+
+    def _start_following(self):
+        """Set up path following and replanning for a freshly planned path."""
+        if self._plan_mode == "timed":
+            # The path is a schedule; its first entry is the current cell at t=0
+            self.path_index = 1 if len(self.path) > 1 else 0
+        elif self._plan_mode == "hierarchical":
+            # Replanned through the cluster graph whenever coverage changes
+            self._planner_key = (self.game_map.grid_version, self.game_map.coverage_version)
+        else:
+            self._create_planner()
 
     def stop_movement(self):
         """Stop the AI movement."""
@@ -87,87 +364,211 @@ class AIAgent:
         self.is_moving = False
         self.move_progress = 0
         self.captured = False
+        self.captured_by = []
         self.escaped = False
+        self.planner = None
+        self._planner_key = None
+        self._path_segments = None
+        self.cancel_planning()
+
+    def set_map(self, game_map):
+        """Move the agent to another map, keeping its loaded sprite."""
+        self.cancel_planning()
+        self.game_map = game_map
+        self.clock = game_map.clock
+        self.last_update = self.clock.now()
+        self._drawn_sprite_rect = None
+        self._drawn_path_key = None
+        self._drawn_path_rect = None
+        self.reset()
+
+    def _uses_hierarchy(self):
+        """Large maps are planned with HPA* instead of a search over every cell."""
+        return self.game_map.size >= self.config.get("hpa_min_map_size", 150)
+
+    def _create_planner(self):
+        """Create the incremental planner, seeded from the map's exit distance field."""
+        self.planner = DStarLite(
+            self.game_map.get_passable_mask(),
+            self.game_map.end_positions,
+            self.pos,
+            distances=self.game_map.get_exit_distances()
+        )
+        self._planner_key = (self.game_map.grid_version, self.game_map.coverage_version)
+
+    def _replan(self):
+        """Repair the plan if the coverage changed since the last tick."""
+        key = (self.game_map.grid_version, self.game_map.coverage_version)
+        if self._planner_key is None or key == self._planner_key:
+            return
+
+        if self.planner is None:
+            # Hierarchical planning only recomputes the clusters that changed
+            self._planner_key = key
+            path = self._find_path_hierarchical()
+        else:
+            if key[0] != self._planner_key[0]:
+                # The grid itself changed, so start the search over
+                self._create_planner()
+            else:
+                self.planner.move_start(self.pos)
+                self.planner.update_passable(self.game_map.get_passable_mask())
+                self._planner_key = key
+            path = self.planner.extract_path()
+
+        if not path:
+            path = self.find_min_exposure_path()
+        if path:
+            self.path = path
+            self.path_index = 1 if len(path) > 1 else 0
+
+    def update(self, dt=None):
+        """Update the AI position based on the path.
+
+        dt is the elapsed time in seconds; if omitted it is read from the clock.
+        """
+        now = self.clock.now()
+        if dt is None:
+            dt = now - self.last_update
+        self.last_update = now
+
+        if self.planning:
+            # Movement has been accounted for up to the start of this tick
+            self._poll_plan(now - dt)
 
-    def update(self, dt):
-        """Update the AI position based on the path."""
         if not self.is_moving or self.captured or self.escaped:
             return
 
         # Update sprite animation
-        self.sprite.update(dt)
+        if self.sprite is not None:
+            self.sprite.update(dt)
         
         if not self.path:
             self.is_moving = False
             return
 
-        # Check if captured by a camera
-        for camera in self.game_map.cameras:
-            if camera.active and camera.can_see(self.pos[0], self.pos[1], self.game_map):
+        with profile("capture_check"):
+            # Check if captured by a camera
+            if self.game_map.is_covered(self.pos[0], self.pos[1]):
                 self.captured = True
-                self.is_moving = False
-                return
-
-        # Check if reached an exit
-        if self.pos in self.game_map.end_positions:
-            self.escaped = True
+                # Only the cameras within range of this cell are tested
+                self.captured_by = self.game_map.watching_cameras(*self.pos)
+            # Check if reached an exit
+            elif self.pos in self.game_map.end_positions:
+                self.escaped = True
+        if self.captured or self.escaped:
             self.is_moving = False
             return
 
+        # Refine the next stretch of a hierarchical path as it is reached
+        if self._path_segments is not None and self.path_index >= len(self.path) - 1:
+            with profile("path_planning"):
+                segment = next(self._path_segments, None)
+            if segment is None:
+                self._path_segments = None
+            elif segment:
+                self.path.extend(segment)
+            else:
+                # The clusters changed under the path; plan again from here
+                self._planner_key = (-1, -1)
+
         # Move along the path
         if self.path_index < len(self.path):
+            # Repair the plan around cells whose coverage flipped
+            with profile("path_planning"):
+                self._replan()
+
             # Calculate how much to move
             self.move_progress += self.speed * dt
             
             if self.move_progress >= 1:
-                # Move to the next cell
-                self.move_progress = 0
+                # Move to the next cell, carrying the overshoot to stay on a timed schedule
+                self.move_progress -= 1
                 self.pos = self.path[self.path_index]
                 self.path_index += 1
 
     def find_path_bfs(self):
-        """Find a path from current position to any exit using BFS."""
-        if not self.game_map.end_positions:
-            print("No exit positions found")
+        """Find a path from current position to any exit that avoids camera vision."""
+        result = plan_path(PlanRequest(self))
+        self._take_plan(result)
+        return result["path"]
+
+    def _take_plan(self, result):
+        """Record how a path was planned, saying once why a timed plan was not possible."""
+        self._path_segments = result["segments"]
+        self._plan_mode = result["mode"]
+        self.path_hidden = result["hidden"]
+        if (self.config.get("path_mode") == "timed" and result["mode"] != "timed"
+                and not self._timed_fallback_logged):
+            self._timed_fallback_logged = True
+            if result["period"] is None:
+                print("Chu kỳ camera không là số bước nguyên, không lập kế hoạch theo thời gian")
+            else:
+                print(f"Chu kỳ camera {result['period']} bước quá dài, không lập kế hoạch theo thời gian")
+
+    def _find_path_hierarchical(self):
+        """Plan through the map's cluster graph, refining only the first segment now."""
+        graph = self.game_map.get_cluster_graph()
+        waypoints = graph.find_path(self.pos, self.game_map.end_positions)
+        self._path_segments = None
+        if not waypoints:
             return []
 
-        # Create a grid to mark visited cells
-        visited = set()
-        queue = deque([(self.pos, [])])  # (position, path_so_far)
-        visited.add(self.pos)
+        self._path_segments = graph.refine(waypoints)
+        path = [self.pos]
+        path.extend(next(self._path_segments, []))
+        return path
 
-        while queue:
-            (x, y), path = queue.popleft()
-            current_path = path + [(x, y)]
+    def find_min_exposure_path(self):
+        """Find the route to an exit that is watched by the fewest cameras."""
+        return min_exposure_path(
+            self.game_map.grid == 0,
+            self.game_map.coverage,
+            self.pos,
+            self.game_map.end_positions,
+            self.config.get("exposure_weight", 10)
+        )
 
-            # Check if reached an exit
-            if (x, y) in self.game_map.end_positions:
-                print(f"Path found with length {len(current_path)}")
-                return current_path
-
-            # Check all four directions
-            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                new_pos = (nx, ny)
-
-                if (0 <= nx < self.game_map.size and 
-                    0 <= ny < self.game_map.size and 
-                    self.game_map.grid[nx][ny] == 0 and  # Chỉ đi trên đường đi, không leo tường
-                    new_pos not in visited):
-                    
-                    # Check if the new position is visible by any camera
-                    visible_to_camera = False
-                    for camera in self.game_map.cameras:
-                        if camera.active and camera.can_see(nx, ny, self.game_map):
-                            visible_to_camera = True
-                            break
-                    
-                    if not visible_to_camera:
-                        queue.append((new_pos, current_path))
-                        visited.add(new_pos)
+    def _sprite_rect(self):
+        """Screen area of the agent sprite at its current cell."""
+        x, y = self.pos
+        size = 10 * (self.cell_size - 4)
+        offset = (size - self.cell_size) // 2 + 1
+        return pygame.Rect(y * self.cell_size - offset, x * self.cell_size - offset, size + 2, size + 2)
 
-        print("No path found")
-        return []  # No path found
+    def _path_rect(self):
+        """Bounding screen area of the path dots."""
+        if not self.path:
+            return None
+        xs = [x for x, _ in self.path]
+        ys = [y for _, y in self.path]
+        return pygame.Rect(
+            min(ys) * self.cell_size,
+            min(xs) * self.cell_size,
+            (max(ys) - min(ys) + 1) * self.cell_size,
+            (max(xs) - min(xs) + 1) * self.cell_size
+        )
+
+    def get_dirty_rects(self, show_path=True):
+        """Screen rects that changed since the last call.
+
+        The sprite is animated, so its old and new areas are always
+        reported; the path only when it or the progress along it changed.
+        """
+        rects = [self._sprite_rect()]
+        if self._drawn_sprite_rect is not None and self._drawn_sprite_rect != rects[0]:
+            rects.append(self._drawn_sprite_rect)
+        self._drawn_sprite_rect = rects[0]
+
+        path_key = (id(self.path), len(self.path), self.path_index, show_path)
+        if path_key != self._drawn_path_key:
+            path_rect = self._path_rect()
+            for rect in (self._drawn_path_rect, path_rect):
+                if rect is not None:
+                    rects.append(rect)
+            self._drawn_path_key = path_key
+            self._drawn_path_rect = path_rect
+        return rects
 
     def render(self, screen):
         """Render the AI agent on the screen."""
@@ -188,7 +589,7 @@ class AIAgent:
         screen_y = x * self.cell_size - (sprite_height - self.cell_size) / 2
         
         # Get current frame from the animated sprite
-        current_frame = self.sprite.get_current_frame()
+        current_frame = self.sprite.get_current_frame() if self.sprite is not None else None
         if current_frame:
             screen.blit(current_frame, (screen_x, screen_y))
         else:
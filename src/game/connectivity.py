@@ -0,0 +1,115 @@
+"""
+Connected-component index of street cells for constant-time reachability checks.
+"""
+import numpy as np
+
+
+def _label_runs(street):
+    """Give every horizontal run of street cells its own id; -1 for barriers."""
+    flat = street.ravel()
+    width = street.shape[1]
+    # A run starts at a street cell whose left neighbour is a barrier or the row start
+    starts = flat.copy()
+    starts[1:] &= ~flat[:-1]
+    starts[::width] = flat[::width]
+    runs = np.cumsum(starts) - 1
+    return np.where(flat, runs, -1).reshape(street.shape), int(starts.sum())
+
+
+def label_components(street):
+    """Label the 4-connected components of a boolean street mask.
+
+    Horizontal runs are joined along vertical adjacencies by repeated
+    min-label hooking and pointer jumping, all as array operations.
+    Returns (labels, count) with -1 for barrier cells.
+    """
+    runs, count = _label_runs(street)
+    if count == 0:
+        # No streets at all
+        return np.full(street.shape, -1, dtype=np.int32), 0
+    vertical = street[:-1] & street[1:]
+    a = runs[:-1][vertical]
+    b = runs[1:][vertical]
+    if len(a):
+        # Runs touch along many neighbouring columns; drop the repeats
+        keep = np.ones(len(a), dtype=bool)
+        keep[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+        a, b = a[keep], b[keep]
+
+    parent = np.arange(count)
+    while len(a):
+        pa, pb = parent[a], parent[b]
+        low = np.minimum(pa, pb)
+        before = parent.copy()
+        np.minimum.at(parent, pa, low)
+        np.minimum.at(parent, pb, low)
+        # Shortcut every id straight to its root
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        if np.array_equal(parent, before):
+            break
+
+    # Renumber roots to consecutive labels
+    roots, labels = np.unique(parent, return_inverse=True)
+    cell_labels = np.where(runs >= 0, labels[np.maximum(runs, 0)], -1)
+    return cell_labels.astype(np.int32), len(roots)
+
+
+class ConnectivityIndex:
+    """Component labels of street cells, kept up to date as walls are opened.
+
+    Opening a cell merges the components around it through a small
+    union-find over labels. Adding walls can split components, so that
+    needs a rebuild.
+    """
+
+    def __init__(self, grid):
+        self.labels = None
+        self.parent = []
+        self.rebuild(grid)
+
+    def rebuild(self, grid):
+        """Recompute the labels of every street cell."""
+        self.labels, count = label_components(grid == 0)
+        self.parent = list(range(count))
+
+    def _find(self, label):
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def component(self, x, y):
+        """Component id of the cell, or -1 if it is a barrier."""
+        label = int(self.labels[x, y])
+        return self._find(label) if label >= 0 else -1
+
+    def connected(self, a, b):
+        """Check if two cells are streets in the same component."""
+        ca = self.component(*a)
+        return ca >= 0 and ca == self.component(*b)
+
+    def open_cell(self, x, y):
+        """Record that the cell (x, y) became a street."""
+        if self.labels[x, y] >= 0:
+            return
+
+        height, width = self.labels.shape
+        roots = set()
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < height and 0 <= ny < width and self.labels[nx, ny] >= 0:
+                roots.add(self._find(int(self.labels[nx, ny])))
+
+        if roots:
+            root = min(roots)
+            for other in roots:
+                self.parent[other] = root
+        else:
+            root = len(self.parent)
+            self.parent.append(root)
+        self.labels[x, y] = root
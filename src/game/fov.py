@@ -0,0 +1,227 @@
+"""
+Field-of-view computation for surveillance cameras.
+
+Two engines are available: recursive shadowcasting, and batched line-of-sight
+tests against a shared table of precomputed rays.
+"""
+import math
+import numpy as np
+
+# Transforms (xx, xy, yx, yy) mapping the canonical octant onto the eight octants
+_OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)
+]
+
+
+# Ray tables shared by all cameras, keyed by vision range
+_RAY_TABLES = {}
+
+
+class RayTable:
+    """Precomputed Bresenham rays for every offset within a radius.
+
+    For each offset (dx, dy) the intermediate cells between the origin and
+    the target are stored as relative row/col index arrays, so line of sight
+    is a fancy-indexing gather over the grid followed by a reduction.
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.rays = {}
+
+        offsets = []
+        rays = []
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                if dx * dx + dy * dy > radius * radius:
+                    continue
+                points = _get_line(0, 0, dx, dy)[1:-1]  # Skip start and end points
+                ray = (np.array([p[0] for p in points], dtype=np.int32),
+                       np.array([p[1] for p in points], dtype=np.int32))
+                self.rays[(dx, dy)] = ray
+                offsets.append((dx, dy))
+                rays.append(points)
+
+        # Padded (offset x ray length) matrices for evaluating all rays at once
+        length = max(1, max(len(points) for points in rays))
+        self.offsets = np.array(offsets, dtype=np.int32)
+        self.ray_rows = np.zeros((len(rays), length), dtype=np.int32)
+        self.ray_cols = np.zeros((len(rays), length), dtype=np.int32)
+        self.ray_valid = np.zeros((len(rays), length), dtype=bool)
+        for i, points in enumerate(rays):
+            for j, (px, py) in enumerate(points):
+                self.ray_rows[i, j] = px
+                self.ray_cols[i, j] = py
+                self.ray_valid[i, j] = True
+
+
+def get_ray_table(radius):
+    """Return the shared ray table for a vision range, building it once."""
+    table = _RAY_TABLES.get(radius)
+    if table is None:
+        table = RayTable(radius)
+        _RAY_TABLES[radius] = table
+    return table
+
+
+def _get_line(x0, y0, x1, y1):
+    """Get a list of points in a line from (x0, y0) to (x1, y1)."""
+    points = []
+    dx = abs(x1 - x0)
+    dy = abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx - dy
+
+    while True:
+        points.append((x0, y0))
+        if x0 == x1 and y0 == y1:
+            break
+        e2 = 2 * err
+        if e2 > -dy:
+            err -= dy
+            x0 += sx
+        if e2 < dx:
+            err += dx
+            y0 += sy
+
+    return points
+
+
+def _angle_of(drow, dcol):
+    """Screen angle in degrees of a grid offset (0: right, 90: down)."""
+    return math.degrees(math.atan2(drow, dcol)) % 360
+
+
+def _angle_diff(a, b):
+    """Smallest absolute difference between two angles in degrees."""
+    return abs((a - b + 180) % 360 - 180)
+
+
+def _octant_overlaps_cone(transform, direction, vision_angle):
+    """Check if an octant intersects the camera's vision cone."""
+    xx, xy, yx, yy = transform
+    # Boundary rays of the canonical octant are (dx=0, dy=-1) and (dx=-1, dy=-1)
+    a1 = _angle_of(-xy, -yy)
+    a2 = _angle_of(-xx - xy, -yx - yy)
+    mid = a1 + ((a2 - a1 + 180) % 360 - 180) / 2
+    return _angle_diff(mid, direction) <= vision_angle / 2 + 22.5
+
+
+def _cast_light(grid, mask, cx, cy, row, start, end, radius, transform, cone):
+    """Scan one octant row by row, recursing around opaque cells."""
+    if start < end:
+        return
+
+    xx, xy, yx, yy = transform
+    height, width = grid.shape
+    radius_sq = radius * radius
+    new_start = start
+
+    for j in range(row, radius + 1):
+        dx, dy = -j - 1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            x = cx + dx * xx + dy * xy
+            y = cy + dx * yx + dy * yy
+            l_slope = (dx - 0.5) / (dy + 0.5)
+            r_slope = (dx + 0.5) / (dy - 0.5)
+            if start < r_slope:
+                continue
+            elif end > l_slope:
+                break
+
+            in_bounds = 0 <= x < height and 0 <= y < width
+            if in_bounds and dx * dx + dy * dy <= radius_sq:
+                if cone is None or _angle_diff(_angle_of(x - cx, y - cy), cone[0]) <= cone[1]:
+                    mask[x, y] = True
+
+            opaque = not in_bounds or grid[x, y] != 0
+            if blocked:
+                if opaque:
+                    new_start = r_slope
+                    continue
+                blocked = False
+                start = new_start
+            elif opaque and j < radius:
+                blocked = True
+                _cast_light(grid, mask, cx, cy, j + 1, start, l_slope, radius, transform, cone)
+                new_start = r_slope
+        if blocked:
+            break
+
+
+def compute_fov_mask(grid, origin, radius, direction=0, vision_angle=360):
+    """Compute the boolean mask of cells visible from origin.
+
+    Non-zero cells of grid are opaque; the origin itself never blocks vision.
+    Only cells within radius and within vision_angle / 2 degrees of direction
+    (0: right, 90: down, 180: left, 270: up) are marked visible.
+    """
+    mask = np.zeros(grid.shape, dtype=bool)
+    cx, cy = origin
+    if not (0 <= cx < grid.shape[0] and 0 <= cy < grid.shape[1]):
+        return mask
+
+    mask[cx, cy] = True
+    # Small tolerance so cells exactly on the cone edge are included
+    cone = None if vision_angle >= 360 else (direction % 360, vision_angle / 2 + 1e-6)
+
+    for transform in _OCTANTS:
+        if cone is not None and not _octant_overlaps_cone(transform, direction, vision_angle):
+            continue
+        _cast_light(grid, mask, cx, cy, 1, 1.0, 0.0, radius, transform, cone)
+
+    return mask
+
+
+def compute_fov(grid, origin, radius, direction=0, vision_angle=360):
+    """Compute the set of (x, y) cells visible from origin."""
+    mask = compute_fov_mask(grid, origin, radius, direction, vision_angle)
+    return {(int(x), int(y)) for x, y in np.argwhere(mask)}
+
+
+def line_of_sight(grid, origin, target, radius):
+    """Check if target is within radius of origin with no barrier in between."""
+    dx, dy = target[0] - origin[0], target[1] - origin[1]
+    ray = get_ray_table(radius).rays.get((dx, dy))
+    if ray is None:
+        return False
+
+    rows = ray[0] + origin[0]
+    cols = ray[1] + origin[1]
+    # Cells outside the grid never block vision
+    inside = (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+    return not grid[rows[inside], cols[inside]].any()
+
+
+def raycast_fov_mask(grid, origin, radius, direction=0, vision_angle=360):
+    """Compute the visible mask by testing every ray of the shared table at once."""
+    mask = np.zeros(grid.shape, dtype=bool)
+    height, width = grid.shape
+    cx, cy = origin
+    table = get_ray_table(radius)
+
+    # Gather the grid along every ray and reduce to one blocked flag per offset
+    rows = table.ray_rows + cx
+    cols = table.ray_cols + cy
+    inside = table.ray_valid & (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    opaque = np.zeros(rows.shape, dtype=bool)
+    opaque[inside] = grid[rows[inside], cols[inside]] != 0
+    visible = ~opaque.any(axis=1)
+
+    target_rows = table.offsets[:, 0] + cx
+    target_cols = table.offsets[:, 1] + cy
+    visible &= (target_rows >= 0) & (target_rows < height) & (target_cols >= 0) & (target_cols < width)
+
+    if vision_angle < 360:
+        angles = np.degrees(np.arctan2(table.offsets[:, 0], table.offsets[:, 1])) % 360
+        diff = np.abs((angles - direction % 360 + 180) % 360 - 180)
+        in_cone = diff <= vision_angle / 2 + 1e-6
+        in_cone |= (table.offsets[:, 0] == 0) & (table.offsets[:, 1] == 0)
+        visible &= in_cone
+
+    mask[target_rows[visible], target_cols[visible]] = True
+    return mask
@@ -5,7 +5,11 @@ import time
 import os
 from src.game.map import GameMap
 from src.game.ai_agent import AIAgent
+from src.game.map_pool import MapPool
 from src.utils.player_profiler import PlayerProfiler
+from src.utils.text_cache import render_text
+from src.utils.sim_clock import RealTimeClock, SimulationClock
+from src.utils.frame_profiler import get_frame_profiler, profile
 
 class Button:
     """Simple button class for UI elements."""
@@ -17,6 +21,7 @@ class Button:
         self.hover_color = hover_color
         self.action = action
         self.hovered = False
+        self.dirty = True  # Needs redrawing in dirty-rect mode
 
     def render(self, screen, font):
         """Render the button on the screen."""
@@ -26,14 +31,17 @@ class Button:
         pygame.draw.rect(screen, (0, 0, 0), self.rect, 2)  # Border
 
         # Draw text
-        text_surf = font.render(self.text, True, (0, 0, 0))
+        text_surf = render_text(font, self.text, True, (0, 0, 0))
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
 
     def handle_event(self, event):
         """Handle mouse events for the button."""
         if event.type == pygame.MOUSEMOTION:
-            self.hovered = self.rect.collidepoint(event.pos)
+            hovered = self.rect.collidepoint(event.pos)
+            if hovered != self.hovered:
+                self.hovered = hovered
+                self.dirty = True
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if self.hovered:
                 self.action()
@@ -43,8 +51,10 @@ class Button:
 class GameEngine:
     """Main game engine class that manages the game state and rendering."""
 
-    def __init__(self, config):
+    def __init__(self, config, headless=False):
+        """Set up the game; a headless engine opens no window and runs on simulated time."""
         self.config = config
+        self.headless = headless
         self.screen_width = config.get("screen_width", 800)
         self.screen_height = config.get("screen_height", 600)
         self.cell_size = config.get("cell_size", 30)
@@ -54,16 +64,30 @@ class GameEngine:
         self.screen_width = max(self.screen_width, self.map_size * self.cell_size + 200)
         self.screen_height = max(self.screen_height, self.map_size * self.cell_size + 100)
 
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
-        pygame.display.set_caption("Giám Sát Thành Phố AI")
+        if headless:
+            # No display: cameras and the agent follow a fixed-step simulation clock
+            self.screen = None
+            self.font = None
+            self.sim_clock = SimulationClock()
+        else:
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+            pygame.display.set_caption("Giám Sát Thành Phố AI")
+            self.font = pygame.font.SysFont(None, 24)
+            self.sim_clock = RealTimeClock()
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont(None, 24)
 
         # Game state
-        self.game_map = GameMap(config)
-        self.ai_agent = AIAgent(self.game_map, config)
+        self.map_seed = config.get("map_seed")  # None: a random map each time
+        self.game_map = GameMap(config, seed=self.map_seed, clock=self.sim_clock)
+        self.ai_agent = AIAgent(self.game_map, config, load_sprite=not headless)
+        # The next maps are generated in the background while this one is played
+        self.map_pool = None
+        pool_size = config.get("map_pool_size", 2)
+        if pool_size > 0 and not headless:
+            next_seed = self.map_seed + 1 if self.map_seed is not None else None
+            self.map_pool = MapPool(config, self.sim_clock, pool_size, next_seed=next_seed)
         self.create_ui()
-        self.state = "placing_cameras"  # States: placing_cameras, simulation
+        self.state = "placing_cameras"  # States: placing_cameras, planning, simulation
         self.simulation_result = None  # None, "captured", or "escaped"
         self.show_path = config.get("show_path", True)  # Option to show AI path
         
@@ -71,6 +95,20 @@ class GameEngine:
         self.player_profiler = PlayerProfiler("default_player")
         self.game_actions = []  # Lưu các hành động trong trò chơi hiện tại
 
+        # "full" redraws and flips every frame; "dirty" only pushes changed rects
+        self.render_mode = config.get("render_mode", "full")
+        self._full_redraw = True
+        self._drawn_status = None
+
+        # Frame timings: F3 shows the percentile overlay, profile_frames names a trace file
+        self.profiler = get_frame_profiler()
+        self.trace_path = config.get("profile_frames")
+        self.show_profiler = bool(config.get("debug_mode", False)) and not headless
+        if self.trace_path or self.show_profiler:
+            self.profiler.start(tracing=bool(self.trace_path))
+        self._profiler_lines = []
+        self._profiler_rect = None
+
     def create_ui(self):
         """Create UI elements like buttons."""
         button_width = 120
@@ -173,9 +211,15 @@ class GameEngine:
                 "cameras": len(self.game_map.cameras)
             })
             
-            self.state = "simulation"
-            self.ai_agent.start_movement()
             self.simulation_result = None
+            if self.headless:
+                # Plan inline so fixed-step runs stay reproducible
+                self.state = "simulation"
+                self.ai_agent.start_movement()
+            else:
+                # The search runs on the planning worker; cameras can still be edited meanwhile
+                self.state = "planning"
+                self.ai_agent.start_movement(background=True)
 
     def reset_game(self):
         """Reset the game state."""
@@ -188,6 +232,7 @@ class GameEngine:
         self.ai_agent.reset()
         self.state = "placing_cameras"
         self.simulation_result = None
+        self._full_redraw = True
 
     def generate_new_map(self):
         """Generate a new map and reset the game."""
@@ -201,9 +246,16 @@ class GameEngine:
         self.player_profiler.add_game_session(self.game_actions)
         self.player_profiler.save_profile()
         
-        # Create new game
-        self.game_map = GameMap(self.config)
-        self.ai_agent = AIAgent(self.game_map, self.config)
+        # Create new game; seeded runs step through consecutive seeds
+        if self.map_seed is not None:
+            self.map_seed += 1
+        if self.map_pool is not None:
+            self.game_map = self.map_pool.take()
+        else:
+            self.game_map = GameMap(self.config, seed=self.map_seed, clock=self.sim_clock)
+        # The agent keeps its sprite; only its map and state change
+        self.ai_agent.set_map(self.game_map)
+        self.selected_camera = None
         self.reset_game()
         
         # Reset game actions for new session
@@ -211,7 +263,7 @@ class GameEngine:
 
     def rotate_selected_camera(self):
         """Rotate the selected camera."""
-        if self.selected_camera is not None and self.state == "placing_cameras":
+        if self.selected_camera is not None and self.state in ("placing_cameras", "planning"):
             camera = self.game_map.cameras[self.selected_camera]
             camera.rotate()
             
@@ -234,10 +286,16 @@ class GameEngine:
                 # Lưu dữ liệu người chơi trước khi thoát
                 self.player_profiler.add_game_session(self.game_actions)
                 self.player_profiler.save_profile()
+                self.write_frame_trace()
+                if self.map_pool is not None:
+                    self.map_pool.shutdown()
                 
                 pygame.quit()
                 sys.exit()
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler_overlay()
+
             # Handle button events
             for button in self.buttons:
                 if button.handle_event(event):
@@ -252,15 +310,11 @@ class GameEngine:
                     grid_x = mouse_y // self.cell_size
                     grid_y = mouse_x // self.cell_size
 
-                    if self.state == "placing_cameras":
+                    if self.state in ("placing_cameras", "planning"):
                         # Place camera on wall
                         if self.game_map.grid[grid_x][grid_y] == 1:
                             # Check if there's already a camera here
-                            camera_index = None
-                            for i, cam in enumerate(self.game_map.cameras):
-                                if cam.x == grid_x and cam.y == grid_y:
-                                    camera_index = i
-                                    break
+                            camera_index = self.game_map.find_camera((grid_x, grid_y))
 
                             if camera_index is not None:
                                 # Select camera for rotation
@@ -286,21 +340,31 @@ class GameEngine:
                                     "time": time.time()
                                 })
 
-    def update(self):
-        """Update game state."""
-        dt = self.clock.get_time() / 1000.0  # Delta time in seconds
+    def update(self, dt=None):
+        """Update game state by dt seconds (the last frame's duration by default)."""
+        if dt is None:
+            dt = self.clock.get_time() / 1000.0  # Delta time in seconds
 
         # Update cameras
-        for camera in self.game_map.cameras:
-            camera.update()
+        with profile("camera_update"):
+            for camera in self.game_map.cameras:
+                camera.update()
 
-        if self.state == "simulation":
+        if self.state == "planning":
+            # Picks up the background plan when it is ready
+            with profile("agent_update"):
+                self.ai_agent.update(dt)
+            if not self.ai_agent.planning:
+                self.state = "simulation"
+
+        elif self.state == "simulation":
             # Add debug info if enabled
             if self.config.get("debug_mode", False):
                 print(f"AI position: {self.ai_agent.pos}, Path length: {len(self.ai_agent.path)}")
                 print(f"Path index: {self.ai_agent.path_index}, Is moving: {self.ai_agent.is_moving}")
 
-            self.ai_agent.update(dt)
+            with profile("agent_update"):
+                self.ai_agent.update(dt)
 
             # Check simulation results
             if self.ai_agent.captured:
@@ -312,6 +376,8 @@ class GameEngine:
                 self.game_actions.append({
                     "type": "ai_captured",
                     "position": self.ai_agent.pos,
+                    "camera_ids": [self.game_map.find_camera((camera.x, camera.y))
+                                   for camera in self.ai_agent.captured_by],
                     "time": time.time()
                 })
                 
@@ -334,6 +400,78 @@ class GameEngine:
 
     def render(self):
         """Render the game state."""
+        if self.render_mode == "dirty":
+            self._render_dirty()
+        else:
+            self.draw()
+            # Update display
+            pygame.display.flip()
+
+    def _render_dirty(self):
+        """Redraw only the areas that changed and push just those to the display."""
+        rects = self._collect_dirty_rects()
+        if not rects:
+            return
+
+        # Drawing is clipped to the changed area; pixels outside it are untouched
+        clip = rects[0].unionall(rects[1:])
+        self.screen.set_clip(clip)
+        self.draw()
+        self.screen.set_clip(None)
+        pygame.display.update(rects)
+
+    def _collect_dirty_rects(self):
+        """Gather the rects changed since the last frame from every component."""
+        map_rects = self.game_map.get_dirty_rects()
+        agent_rects = self.ai_agent.get_dirty_rects(self.show_path)
+        if self._full_redraw:
+            self._full_redraw = False
+            for button in self.buttons:
+                button.dirty = False
+            self._drawn_status = self.get_status_lines()
+            return [self.screen.get_rect()]
+
+        rects = map_rects + agent_rects
+        for button in self.buttons:
+            if button.dirty:
+                rects.append(button.rect)
+                button.dirty = False
+
+        if self.show_profiler and self._profiler_rect is not None:
+            # The overlay's numbers change while it is shown
+            rects.append(self._profiler_rect)
+
+        status = self.get_status_lines()
+        if status != self._drawn_status:
+            map_width = self.map_size * self.cell_size
+            rects.append(pygame.Rect(map_width, 110, self.screen_width - map_width, 160))
+            self._drawn_status = status
+
+        screen_rect = self.screen.get_rect()
+        return [rect.clip(screen_rect) for rect in rects if rect.colliderect(screen_rect)]
+
+    def get_status_lines(self):
+        """Status text shown beside the map as (text, colour, y) tuples."""
+        lines = [
+            (f"Trạng thái: {self.get_state_text()}", (0, 0, 0), 120),
+            # Show if path is visible
+            (f"Hiện đường đi: {'Có' if self.show_path else 'Không'}", (0, 0, 0), 150),
+            # Show player stats
+            (f"Thắng/Thua: {self.player_profiler.detection_success}/{self.player_profiler.detection_failure}",
+             (0, 0, 0), 180)
+        ]
+
+        if self.selected_camera is not None and self.state in ("placing_cameras", "planning"):
+            lines.append((f"Camera đã chọn: {self.selected_camera + 1}", (0, 0, 0), 210))
+
+        if self.simulation_result:
+            result_text = f"AI đã {'bị phát hiện' if self.simulation_result == 'captured' else 'thoát thành công'}!"
+            result_color = (255, 0, 0) if self.simulation_result == "captured" else (0, 128, 0)
+            lines.append((result_text, result_color, 240))
+        return lines
+
+    def draw(self):
+        """Draw the whole game state onto the screen surface."""
         # Fill background with white
         self.screen.fill(self.config["colors"]["background"])
 
@@ -341,44 +479,32 @@ class GameEngine:
         self.game_map.render(self.screen)
 
         # Render AI agent (with path if enabled)
-        if self.show_path:
-            self.ai_agent.render(self.screen)
-        else:
-            # Override render_path method temporarily
-            original_render_path = self.ai_agent.render_path
-            self.ai_agent.render_path = lambda x: None
-            self.ai_agent.render(self.screen)
-            self.ai_agent.render_path = original_render_path
-
+        with profile("agent_render"):
+            if self.show_path:
+                self.ai_agent.render(self.screen)
+            else:
+                # Override render_path method temporarily
+                original_render_path = self.ai_agent.render_path
+                self.ai_agent.render_path = lambda x: None
+                self.ai_agent.render(self.screen)
+                self.ai_agent.render_path = original_render_path
+
+        with profile("ui_text"):
+            self._draw_ui()
+
+        if self.show_profiler:
+            self._draw_profiler_overlay()
+
+    def _draw_ui(self):
+        """Draw the buttons, status and instructions beside the map."""
         # Render UI
         for button in self.buttons:
             button.render(self.screen, self.font)
 
         # Render status text
-        status_text = f"Trạng thái: {self.get_state_text()}"
-        status_surf = self.font.render(status_text, True, (0, 0, 0))
-        self.screen.blit(status_surf, (self.map_size * self.cell_size + 20, 120))
-
-        # Show if path is visible
-        path_text = f"Hiện đường đi: {'Có' if self.show_path else 'Không'}"
-        path_surf = self.font.render(path_text, True, (0, 0, 0))
-        self.screen.blit(path_surf, (self.map_size * self.cell_size + 20, 150))
-
-        # Show player stats
-        stats_text = f"Thắng/Thua: {self.player_profiler.detection_success}/{self.player_profiler.detection_failure}"
-        stats_surf = self.font.render(stats_text, True, (0, 0, 0))
-        self.screen.blit(stats_surf, (self.map_size * self.cell_size + 20, 180))
-
-        if self.selected_camera is not None and self.state == "placing_cameras":
-            camera_text = f"Camera đã chọn: {self.selected_camera + 1}"
-            camera_surf = self.font.render(camera_text, True, (0, 0, 0))
-            self.screen.blit(camera_surf, (self.map_size * self.cell_size + 20, 210))
-
-        if self.simulation_result:
-            result_text = f"AI đã {'bị phát hiện' if self.simulation_result == 'captured' else 'thoát thành công'}!"
-            result_color = (255, 0, 0) if self.simulation_result == "captured" else (0, 128, 0)
-            result_surf = self.font.render(result_text, True, result_color)
-            self.screen.blit(result_surf, (self.map_size * self.cell_size + 20, 240))
+        for text, color, y in self.get_status_lines():
+            text_surf = render_text(self.font, text, True, color)
+            self.screen.blit(text_surf, (self.map_size * self.cell_size + 20, y))
 
         # Draw instructions
         instructions = [
@@ -394,24 +520,100 @@ class GameEngine:
         ]
 
         for i, line in enumerate(instructions):
-            instr_surf = self.font.render(line, True, (0, 0, 0))
+            instr_surf = render_text(self.font, line, True, (0, 0, 0))
             self.screen.blit(instr_surf, (self.map_size * self.cell_size + 20, 280 + i * 25))
 
-        # Update display
-        pygame.display.flip()
-        
+    def toggle_profiler_overlay(self):
+        """Show or hide the frame timing overlay."""
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler:
+            self.profiler.start()
+        self._full_redraw = True
+
+    def _draw_profiler_overlay(self):
+        """Draw the rolling frame time percentiles in the map's top-left corner."""
+        # Refresh the numbers twice a second so the text stays readable (and cached)
+        if not self._profiler_lines or self.profiler.frames % 30 == 0:
+            self._profiler_lines = self.profiler.format_summary()
+
+        line_height = 18
+        surfaces = [render_text(self.font, line, True, (255, 255, 255)) for line in self._profiler_lines]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        rect = pygame.Rect(0, 0, width, len(surfaces) * line_height + 6)
+        background = pygame.Surface(rect.size, pygame.SRCALPHA)
+        background.fill((0, 0, 0, 180))
+        self.screen.blit(background, rect)
+        for i, surface in enumerate(surfaces):
+            self.screen.blit(surface, (5, 3 + i * line_height))
+        # Cover the last drawn overlay too, in case it shrank
+        self._profiler_rect = rect if self._profiler_rect is None else rect.union(self._profiler_rect)
+
+    def write_frame_trace(self):
+        """Write the recorded frame sections to the trace file, if one was requested."""
+        if self.trace_path and self.profiler.tracing:
+            count = self.profiler.write_trace(self.trace_path)
+            print(f"Đã ghi {count} sự kiện profile vào {self.trace_path}")
+
     def get_state_text(self):
         """Get the state text in Vietnamese."""
         if self.state == "placing_cameras":
             return "Đặt Camera"
+        elif self.state == "planning":
+            return "Đang tìm đường..."
         elif self.state == "simulation":
             return "Đang mô phỏng"
         return self.state.capitalize()
 
+    def place_cameras(self, layout):
+        """Place cameras from a layout of (x, y) or (x, y, direction) entries."""
+        placed = 0
+        for entry in layout:
+            x, y = entry[0], entry[1]
+            if self.game_map.add_camera((x, y)):
+                placed += 1
+                camera = self.game_map.cameras[-1]
+                direction = entry[2] if len(entry) > 2 else 0
+                for _ in range(int(direction) // 90 % 4):
+                    camera.rotate()
+        return placed
+
+    def run_headless(self, max_ticks=100000, dt=1 / 60):
+        """Run one simulation with fixed time steps and no display.
+
+        Steps the simulation clock by dt until the AI is captured or
+        escapes, or max_ticks have passed, as fast as the CPU allows.
+        Returns a summary of the run.
+        """
+        if not isinstance(self.sim_clock, SimulationClock):
+            raise RuntimeError("run_headless needs an engine created with headless=True")
+
+        self.start_simulation()
+        ticks = 0
+        while ticks < max_ticks and self.state == "simulation":
+            self.profiler.begin_frame()
+            self.sim_clock.advance(dt)
+            self.update(dt)
+            self.profiler.end_frame()
+            ticks += 1
+        self.write_frame_trace()
+
+        return {
+            "result": self.simulation_result,
+            "ticks": ticks,
+            "sim_time": ticks * dt,
+            "position": self.ai_agent.pos,
+            "cameras": len(self.game_map.cameras)
+        }
+
     def run(self):
         """Main game loop."""
         while True:
-            self.handle_events()
-            self.update()
-            self.render()
+            self.profiler.begin_frame()
+            with profile("events"):
+                self.handle_events()
+            with profile("update"):
+                self.update()
+            with profile("render"):
+                self.render()
+            self.profiler.end_frame()
             self.clock.tick(60)
@@ -0,0 +1,249 @@
+"""
+Hierarchical pathfinding (HPA*) over a cluster abstraction of the grid.
+"""
+import heapq
+from collections import defaultdict, deque
+from src.game.pathfinding import DIRECTIONS, astar
+
+# Border openings at least this long get a transition at both ends
+_LONG_ENTRANCE = 6
+
+
+class ClusterGraph:
+    """Abstract graph of cluster entrances used to plan on very large maps.
+
+    The grid is cut into square clusters. Entrances are the openings on the
+    borders between neighbouring clusters; each becomes a pair of abstract
+    nodes joined by a unit edge. Distances between the nodes of one cluster
+    are computed lazily, the first time a search reaches that cluster.
+    """
+
+    def __init__(self, passable, cluster_size=16):
+        self.passable = passable.copy()
+        self.height, self.width = passable.shape
+        self.cluster_size = cluster_size
+        self.rows = (self.height + cluster_size - 1) // cluster_size
+        self.cols = (self.width + cluster_size - 1) // cluster_size
+
+        self.transitions = {}  # (cluster, cluster) -> [(cell, cell)]
+        self.inter = defaultdict(set)  # node -> nodes across a border
+        self.nodes = {}  # cluster -> set of nodes
+        self.intra = {}  # cluster -> {node: {node: distance}}
+
+        for cx in range(self.rows):
+            for cy in range(self.cols):
+                if cy + 1 < self.cols:
+                    self._build_border((cx, cy), (cx, cy + 1))
+                if cx + 1 < self.rows:
+                    self._build_border((cx, cy), (cx + 1, cy))
+        for cx in range(self.rows):
+            for cy in range(self.cols):
+                self._build_nodes((cx, cy))
+
+    def copy(self):
+        """Independent copy of the graph, so a search on another thread cannot race with updates.
+
+        Transition lists, node sets and intra distance tables are replaced
+        whole when they change, so only the inter sets need copying.
+        """
+        other = object.__new__(ClusterGraph)
+        other.__dict__.update(self.__dict__)
+        other.transitions = dict(self.transitions)
+        other.inter = defaultdict(set, {node: set(links) for node, links in self.inter.items()})
+        other.nodes = dict(self.nodes)
+        other.intra = dict(self.intra)
+        return other
+
+    def cluster_of(self, cell):
+        """Get the cluster containing a cell."""
+        return (cell[0] // self.cluster_size, cell[1] // self.cluster_size)
+
+    def _bounds(self, cluster):
+        cx, cy = cluster
+        size = self.cluster_size
+        return (cx * size, min(self.height, (cx + 1) * size),
+                cy * size, min(self.width, (cy + 1) * size))
+
+    def _neighbour_clusters(self, cluster):
+        cx, cy = cluster
+        for dx, dy in DIRECTIONS:
+            nx, ny = cx + dx, cy + dy
+            if 0 <= nx < self.rows and 0 <= ny < self.cols:
+                yield (nx, ny)
+
+    def _build_border(self, c1, c2):
+        """Find the entrances on the border between two adjacent clusters."""
+        c1, c2 = sorted((c1, c2))
+        for a, b in self.transitions.get((c1, c2), []):
+            self.inter[a].discard(b)
+            self.inter[b].discard(a)
+
+        x1, x2, y1, y2 = self._bounds(c1)
+        if c1[0] == c2[0]:
+            # Vertical border: c2 is to the right of c1
+            pairs = [((x, y2 - 1), (x, y2)) for x in range(x1, x2)]
+        else:
+            # Horizontal border: c2 is below c1
+            pairs = [((x2 - 1, y), (x2, y)) for y in range(y1, y2)]
+
+        transitions = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and self.passable[pair[0]] and self.passable[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                if len(run) >= _LONG_ENTRANCE:
+                    transitions.extend([run[0], run[-1]])
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+
+        self.transitions[(c1, c2)] = transitions
+        for a, b in transitions:
+            self.inter[a].add(b)
+            self.inter[b].add(a)
+
+    def _build_nodes(self, cluster):
+        """Collect the entrance nodes lying inside a cluster."""
+        nodes = set()
+        for other in self._neighbour_clusters(cluster):
+            for a, b in self.transitions.get(tuple(sorted((cluster, other))), []):
+                nodes.add(a if self.cluster_of(a) == cluster else b)
+        self.nodes[cluster] = nodes
+        self.intra.pop(cluster, None)
+
+    def _cluster_distances(self, source, cluster, targets):
+        """BFS inside one cluster from source; returns distances to reachable targets."""
+        x1, x2, y1, y2 = self._bounds(cluster)
+        height, width = x2 - x1, y2 - y1
+        block = self.passable[x1:x2, y1:y2].ravel().tolist()
+
+        # Work on flat indices local to the cluster
+        remaining = {(x - x1) * width + (y - y1): (x, y) for x, y in targets}
+        start = (source[0] - x1) * width + (source[1] - y1)
+        distances = [-1] * (height * width)
+        distances[start] = 0
+        queue = deque([start])
+        found = {}
+        while queue and remaining:
+            index = queue.popleft()
+            if index in remaining:
+                found[remaining.pop(index)] = distances[index]
+            x, y = divmod(index, width)
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < height and 0 <= ny < width:
+                    n_index = nx * width + ny
+                    if block[n_index] and distances[n_index] == -1:
+                        distances[n_index] = distances[index] + 1
+                        queue.append(n_index)
+        return found
+
+    def _intra_edges(self, cluster):
+        """Distances between the nodes of a cluster, computed on first use."""
+        edges = self.intra.get(cluster)
+        if edges is None:
+            nodes = self.nodes[cluster]
+            edges = {node: self._cluster_distances(node, cluster, nodes - {node}) for node in nodes}
+            self.intra[cluster] = edges
+        return edges
+
+    def update(self, passable, regions):
+        """Apply a new passable grid, recomputing only clusters touching regions.
+
+        Each region is an inclusive (x1, y1, x2, y2) cell rectangle.
+        """
+        self.passable = passable.copy()
+        clusters = set()
+        for x1, y1, x2, y2 in regions:
+            cx1, cy1 = self.cluster_of((max(0, x1), max(0, y1)))
+            cx2, cy2 = self.cluster_of((min(self.height - 1, x2), min(self.width - 1, y2)))
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    clusters.add((cx, cy))
+
+        touched = set(clusters)
+        for cluster in clusters:
+            for other in self._neighbour_clusters(cluster):
+                self._build_border(cluster, other)
+                touched.add(other)
+        for cluster in touched:
+            self._build_nodes(cluster)
+
+    def find_path(self, start, goals):
+        """Search the abstract graph; returns waypoints from start to a goal, or []."""
+        goals = [goal for goal in goals
+                 if 0 <= goal[0] < self.height and 0 <= goal[1] < self.width and self.passable[goal]]
+        if not goals or start is None:
+            return []
+
+        # Temporarily link the start and goals to the nodes of their clusters
+        start_cluster = self.cluster_of(start)
+        start_links = self._cluster_distances(
+            start, start_cluster,
+            self.nodes[start_cluster] | {g for g in goals if self.cluster_of(g) == start_cluster}
+        )
+        goal_links = defaultdict(dict)
+        for goal in goals:
+            cluster = self.cluster_of(goal)
+            for node, distance in self._cluster_distances(goal, cluster, self.nodes[cluster]).items():
+                goal_links[node][goal] = distance
+
+        goal_set = set(goals)
+
+        def heuristic(cell):
+            return min(abs(cell[0] - gx) + abs(cell[1] - gy) for gx, gy in goals)
+
+        cost = {start: 0}
+        parent = {start: None}
+        # Ties on f are broken towards the goal, as in astar
+        frontier = [(heuristic(start), heuristic(start), 0, start)]
+        while frontier:
+            _, _, current, node = heapq.heappop(frontier)
+            if current > cost[node]:
+                continue
+            if node in goal_set:
+                waypoints = []
+                while node is not None:
+                    waypoints.append(node)
+                    node = parent[node]
+                waypoints.reverse()
+                return waypoints
+
+            if node == start:
+                edges = list(start_links.items())
+                # The start may itself be an entrance node with links across the border
+                edges.extend((other, 1) for other in self.inter.get(start, ()))
+                edges.extend(goal_links.get(start, {}).items())
+            else:
+                edges = list(self._intra_edges(self.cluster_of(node)).get(node, {}).items())
+                edges.extend((other, 1) for other in self.inter[node])
+                edges.extend(goal_links.get(node, {}).items())
+
+            for other, distance in edges:
+                new_cost = current + distance
+                if new_cost < cost.get(other, float("inf")):
+                    cost[other] = new_cost
+                    parent[other] = node
+                    h = heuristic(other)
+                    heapq.heappush(frontier, (new_cost + h, h, new_cost, other))
+
+        return []
+
+    def refine(self, waypoints):
+        """Lazily expand waypoints into cells, yielding one segment at a time.
+
+        Each segment excludes its first cell, so concatenating the segments
+        after the start gives the full path. A segment is [] if the grid
+        changed and the cluster no longer connects its waypoints.
+        """
+        for a, b in zip(waypoints, waypoints[1:]):
+            if abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1:
+                yield [b]
+                continue
+
+            # Both waypoints lie in one cluster; search only inside it
+            x1, x2, y1, y2 = self._bounds(self.cluster_of(b))
+            local = astar(self.passable[x1:x2, y1:y2], (a[0] - x1, a[1] - y1), [(b[0] - x1, b[1] - y1)])
+            yield [(x + x1, y + y1) for x, y in local[1:]]
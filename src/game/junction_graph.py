@@ -0,0 +1,340 @@
+"""
+Junction graph contracted from the maze grid.
+"""
+import heapq
+import numpy as np
+from src.game.pathfinding import DIRECTIONS, _manhattan_heuristic
+
+
+def _street_degree(street):
+    """Number of street neighbours of every cell."""
+    padded = np.pad(street, 1).astype(np.int8)
+    return padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+
+
+def find_junctions(grid):
+    """Street cells with three or more street neighbours as an (n, 2) array, in row-major order."""
+    street = grid == 0
+    return np.argwhere(street & (_street_degree(street) >= 3))
+
+
+def worth_contracting(street, ratio=0.5):
+    """Whether a junction graph of the streets would have at most ratio nodes per street cell.
+
+    Mazes with many openings leave most cells as junctions; a graph of
+    those is barely smaller than the grid and slower to search.
+    """
+    nodes = np.count_nonzero(street & (_street_degree(street) != 2))
+    return nodes <= ratio * np.count_nonzero(street)
+
+
+class Corridor:
+    """A run of street cells between two graph nodes."""
+
+    def __init__(self, start, end, cells):
+        self.start = start
+        self.end = end
+        self.cells = cells  # Interior cells, ordered from start to end
+
+    @property
+    def length(self):
+        """Number of moves needed to walk from one end to the other."""
+        return len(self.cells) + 1
+
+    def __repr__(self):
+        return f"Corridor({self.start}, {self.end}, length={self.length})"
+
+
+class JunctionGraph:
+    """Graph of junctions and dead ends joined by corridors.
+
+    Every street cell with other than two street neighbours becomes a node,
+    as do the anchor cells (start and exits). The remaining street cells lie
+    on exactly one corridor. Loops of corridor cells with no node on them
+    cannot be reached from any node and are left out.
+    """
+
+    def __init__(self, grid, anchors=()):
+        self.anchors = set(anchors)
+        self.street = None
+        self.height, self.width = grid.shape
+        self.nodes = set()
+        self.edges = {}  # key -> Corridor
+        self.adjacency = {}  # node -> set of edge keys
+        self.cell_edge = {}  # corridor cell -> edge key
+        self.rebuild(grid)
+
+    def copy(self):
+        """Independent copy of the graph, so a search on another thread cannot race with updates.
+
+        Corridors are replaced, never changed, so only the containers and
+        the adjacency sets need copying.
+        """
+        other = object.__new__(JunctionGraph)
+        other.__dict__.update(self.__dict__)
+        other.nodes = set(self.nodes)
+        other.edges = dict(self.edges)
+        other.adjacency = {node: set(keys) for node, keys in self.adjacency.items()}
+        other.cell_edge = dict(self.cell_edge)
+        return other
+
+    def _degree(self, x, y):
+        street = self.street
+        count = 0
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.height and 0 <= ny < self.width and street[nx, ny]:
+                count += 1
+        return count
+
+    def _is_node(self, cell):
+        return self.street[cell] and (cell in self.anchors or self._degree(*cell) != 2)
+
+    def rebuild(self, grid):
+        """Build the whole graph from a grid (0: street, non-zero: barrier)."""
+        self.street = grid == 0
+        nodes = self.street & (_street_degree(self.street) != 2)
+        for cell in self.anchors:
+            if self.street[cell]:
+                nodes[cell] = True
+
+        self.nodes = {(int(x), int(y)) for x, y in np.argwhere(nodes)}
+        self.edges = {}
+        self.adjacency = {node: set() for node in self.nodes}
+        self.cell_edge = {}
+        for node in self.nodes:
+            self._trace_from(node)
+
+    def _trace(self, node, first):
+        """Walk a corridor from node through first until the next node."""
+        cells = []
+        previous, current = node, first
+        while current not in self.nodes:
+            cells.append(current)
+            x, y = current
+            for dx, dy in DIRECTIONS:
+                nxt = (x + dx, y + dy)
+                if nxt != previous and 0 <= nxt[0] < self.height and 0 <= nxt[1] < self.width \
+                        and self.street[nxt]:
+                    previous, current = current, nxt
+                    break
+        return current, cells
+
+    def _trace_from(self, node):
+        """Add every corridor leaving node."""
+        x, y = node
+        for dx, dy in DIRECTIONS:
+            first = (x + dx, y + dy)
+            if not (0 <= first[0] < self.height and 0 <= first[1] < self.width and self.street[first]):
+                continue
+            end, cells = self._trace(node, first)
+            last = cells[-1] if cells else node
+            # Both walking directions give the same key, so corridors are stored once
+            key = min((node, first, end, last), (end, last, node, first))
+            if key in self.edges:
+                continue
+            if key != (node, first, end, last):
+                cells.reverse()
+            corridor = Corridor(key[0], key[2], cells)
+            self.edges[key] = corridor
+            self.adjacency[corridor.start].add(key)
+            self.adjacency[corridor.end].add(key)
+            for cell in cells:
+                self.cell_edge[cell] = key
+
+    def _remove_edge(self, key):
+        corridor = self.edges.pop(key, None)
+        if corridor is None:
+            return
+        for node in (corridor.start, corridor.end):
+            if node in self.adjacency:
+                self.adjacency[node].discard(key)
+        for cell in corridor.cells:
+            if self.cell_edge.get(cell) == key:
+                del self.cell_edge[cell]
+
+    def update_cells(self, grid, cells):
+        """Apply grid changes at the given cells, re-tracing only nearby corridors."""
+        self.street = grid == 0
+        affected = set()
+        for x, y in cells:
+            affected.add((x, y))
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.height and 0 <= ny < self.width:
+                    affected.add((nx, ny))
+
+        # Drop every corridor touching an affected cell, remembering the far ends
+        retrace = set()
+        for cell in affected:
+            keys = set(self.adjacency.get(cell, ()))
+            if cell in self.cell_edge:
+                keys.add(self.cell_edge[cell])
+            for key in keys:
+                corridor = self.edges.get(key)
+                if corridor is not None:
+                    retrace.update((corridor.start, corridor.end))
+                    self._remove_edge(key)
+
+        for cell in affected:
+            if self._is_node(cell):
+                if cell not in self.nodes:
+                    self.nodes.add(cell)
+                    self.adjacency[cell] = set()
+                retrace.add(cell)
+            elif cell in self.nodes:
+                self.nodes.discard(cell)
+                del self.adjacency[cell]
+                retrace.discard(cell)
+
+        # New corridor cells lead back to nodes that must be re-traced too
+        for cell in affected:
+            if self.street[cell] and cell not in self.nodes:
+                x, y = cell
+                for dx, dy in DIRECTIONS:
+                    nxt = (x + dx, y + dy)
+                    if 0 <= nxt[0] < self.height and 0 <= nxt[1] < self.width and self.street[nxt]:
+                        end, _ = self._trace_limited(cell, nxt)
+                        if end is not None:
+                            retrace.add(end)
+
+        for node in retrace:
+            if node in self.nodes:
+                self._trace_from(node)
+
+    def _trace_limited(self, start, first):
+        """Like _trace from a corridor cell; returns (None, cells) on a node-free loop."""
+        cells = []
+        previous, current = start, first
+        while current not in self.nodes:
+            if current == start:
+                return None, cells
+            cells.append(current)
+            x, y = current
+            for dx, dy in DIRECTIONS:
+                nxt = (x + dx, y + dy)
+                if nxt != previous and 0 <= nxt[0] < self.height and 0 <= nxt[1] < self.width \
+                        and self.street[nxt]:
+                    previous, current = current, nxt
+                    break
+        return current, cells
+
+    def junctions(self):
+        """Nodes with three or more corridors leaving them, in row-major order."""
+        return sorted(node for node in self.nodes if self._degree(*node) >= 3)
+
+    def _attach(self, cell):
+        """Link a cell to the graph: [(node, distance, cells after cell up to node)]."""
+        if cell in self.nodes:
+            return [(cell, 0, [])]
+        key = self.cell_edge.get(cell)
+        if key is None:
+            return []
+        corridor = self.edges[key]
+        i = corridor.cells.index(cell)
+        before = corridor.cells[:i]
+        after = corridor.cells[i + 1:]
+        return [
+            (corridor.start, i + 1, before[::-1] + [corridor.start]),
+            (corridor.end, len(corridor.cells) - i, after + [corridor.end])
+        ]
+
+    def _blocked(self, passable):
+        """Nodes and corridors with a cell outside passable: (nodes, edge keys)."""
+        nodes, keys = set(), set()
+        if passable is None:
+            return nodes, keys
+        # Few street cells are watched, so look only at those
+        for x, y in np.argwhere(self.street & ~passable).tolist():
+            cell = (x, y)
+            if cell in self.nodes:
+                nodes.add(cell)
+            elif cell in self.cell_edge:
+                keys.add(self.cell_edge[cell])
+        return nodes, keys
+
+    def shortest_path(self, start, goals, passable=None):
+        """A* over corridors from start to the nearest goal.
+
+        Returns the full cell path including start, or [] if no goal is
+        reachable. Corridors with a cell outside passable are skipped.
+        """
+        goals = [goal for goal in goals if 0 <= goal[0] < self.height and 0 <= goal[1] < self.width]
+        if not goals:
+            return []
+        blocked_nodes, blocked_keys = self._blocked(passable)
+        goal_links = {}
+        direct = None
+        start_key = self.cell_edge.get(start)
+        for goal in goals:
+            if start_key is not None and self.cell_edge.get(goal) == start_key:
+                # Start and goal on one corridor: walking straight along it is a candidate
+                cells = self.edges[start_key].cells
+                i, j = cells.index(start), cells.index(goal)
+                step = 1 if j > i else -1
+                walk = cells[i:j + step:step] if j + step >= 0 else cells[i::step]
+                if (passable is None or all(passable[c] for c in walk[1:])) and \
+                        (direct is None or len(walk) < len(direct)):
+                    direct = walk
+            for node, distance, cells in self._attach(goal):
+                # Cells from the node back to the goal
+                back = cells[-2::-1] + [goal] if cells else []
+                if passable is None or all(passable[c] for c in back):
+                    if distance < goal_links.get(node, (float("inf"),))[0]:
+                        goal_links[node] = (distance, back)
+        if not goal_links:
+            return direct or []
+
+        # Corridors are at least as long as the Manhattan distance between
+        # their ends, so this never overestimates
+        heuristic = _manhattan_heuristic(goals)
+        cost = {}
+        parent = {}
+        frontier = []
+        for node, distance, cells in self._attach(start):
+            if passable is None or all(passable[c] for c in cells):
+                if distance < cost.get(node, float("inf")):
+                    cost[node] = distance
+                    parent[node] = (None, cells)
+                    heapq.heappush(frontier, (distance + heuristic(*node), distance, node))
+
+        best = None
+        while frontier:
+            estimate, current, node = heapq.heappop(frontier)
+            if current > cost[node]:
+                continue
+            if best is not None and estimate >= best[0]:
+                break
+            if node in goal_links:
+                total = current + goal_links[node][0]
+                if best is None or total < best[0]:
+                    best = (total, node)
+            for key in self.adjacency[node]:
+                if key in blocked_keys:
+                    continue
+                corridor = self.edges[key]
+                if corridor.start == node:
+                    other, cells = corridor.end, corridor.cells + [corridor.end]
+                else:
+                    other, cells = corridor.start, corridor.cells[::-1] + [corridor.start]
+                if other in blocked_nodes:
+                    continue
+                new_cost = current + corridor.length
+                if new_cost < cost.get(other, float("inf")):
+                    cost[other] = new_cost
+                    parent[other] = (node, cells)
+                    heapq.heappush(frontier, (new_cost + heuristic(*other), new_cost, other))
+
+        if best is None or (direct is not None and len(direct) - 1 <= best[0]):
+            return direct or []
+
+        node = best[1]
+        segments = [goal_links[node][1]]
+        while node is not None:
+            previous, cells = parent[node]
+            segments.append(cells)
+            node = previous
+        path = [start]
+        for cells in reversed(segments):
+            path.extend(cells)
+        return path
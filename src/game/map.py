@@ -2,34 +2,193 @@ import pygame
 import random
 import numpy as np
 import math
-import time
+from functools import reduce
+from src.game.fov import compute_fov_mask, raycast_fov_mask
+from src.game.pathfinding import distance_field, follow_distance_field
+from src.game.hpa import ClusterGraph
+from src.game.junction_graph import JunctionGraph, find_junctions
+from src.game.map_cache import MapCache
+from src.game.connectivity import ConnectivityIndex
+from src.utils.sim_clock import RealTimeClock
+from src.utils.frame_profiler import profile
+
+# Pre-rendered vision cone sprites shared by all cameras,
+# keyed by (range, direction, angle, cell size, colour)
+_CONE_SPRITES = {}
+
+
+def _cone_points(center_x, center_y, radius, direction, vision_angle, steps=16):
+    """Get the polygon outline of a vision cone in screen coordinates."""
+    if vision_angle >= 360:
+        angles = np.linspace(0, 2 * np.pi, steps * 2, endpoint=False)
+        points = []
+    else:
+        half = vision_angle / 2
+        angles = np.radians(np.linspace(direction - half, direction + half, steps))
+        points = [(center_x, center_y)]
+
+    points.extend(
+        (center_x + radius * np.cos(angle), center_y + radius * np.sin(angle))
+        for angle in angles
+    )
+    return points
+
+
+def get_cone_sprite(vision_range, direction, vision_angle, cell_size, color):
+    """Return a premultiplied-alpha sprite of a vision cone and its offset from the camera cell.
+
+    The sprite is drawn once per key and blitted at the camera cell's
+    top-left pixel plus the returned offset.
+    """
+    key = (vision_range, direction, vision_angle, cell_size, tuple(color))
+    cached = _CONE_SPRITES.get(key)
+    if cached is None:
+        radius = vision_range * cell_size
+        margin = radius + 1
+        size = 2 * margin + cell_size
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        center = margin + cell_size / 2
+        points = _cone_points(center, center, radius, direction, vision_angle)
+        pygame.draw.polygon(sprite, color, points)
+        cached = (sprite.premul_alpha(), -margin)
+        _CONE_SPRITES[key] = cached
+    return cached
+
+
+def coverage_phases(schedules, size, step_time, max_period=256):
+    """Predict the coverage for each step of the cameras' scan/rest cycles.
+
+    schedules comes from GameMap.camera_schedules(). Returns (phases,
+    period): phases[t] is the coverage t steps of step_time seconds after
+    the snapshot, bit-packed along the columns, and the pattern repeats
+    every period steps. phases is None if no exact period exists: a camera
+    cycle that is not a whole number of steps, or a common period longer
+    than max_period.
+    """
+    steps = []
+    for _, scan_time, rest_time, _ in schedules:
+        cycle = (scan_time + rest_time) / step_time
+        if abs(cycle - round(cycle)) > 1e-6:
+            return None, None
+        steps.append(max(1, round(cycle)))
+    period = reduce(math.lcm, steps, 1)
+    if period > max_period:
+        return None, period
+
+    phases = np.zeros((period, size, (size + 7) // 8), dtype=np.uint8)
+    for t in range(period):
+        covered = np.zeros((size, size), dtype=bool)
+        for mask, scan_time, rest_time, position in schedules:
+            if _scanning_at(position + t * step_time, scan_time, rest_time):
+                covered |= mask
+        phases[t] = np.packbits(covered, axis=1)
+    return phases, period
+
+
+def _scanning_at(position, scan_time, rest_time):
+    """Whether position seconds into a scan/rest cycle falls in the scan."""
+    cycle = scan_time + rest_time
+    if cycle <= 0:
+        # A cycle of no length never rests
+        return True
+    return position % cycle < scan_time
+
 
 class GameMap:
     """Class representing the game map with barriers and streets."""
 
-    def __init__(self, config):
-        """Initialize the game map with configuration."""
+    def __init__(self, config, seed=None, grid=None, clock=None):
+        """Initialize the game map with configuration.
+
+        With a seed (or config "map_seed") the map is reproducible and cached
+        on disk; otherwise the global random module is used. If grid is
+        given it is used as the maze instead of generating one. The clock
+        (wall-clock time by default) drives the cameras' scan/rest cycle.
+        """
         self.config = config
-        self.size = config.get("map_size", 30)  # Increased default map size to 30x30
+        self.clock = clock if clock is not None else RealTimeClock()
+        self.seed = seed if seed is not None else config.get("map_seed")
+        self.rng = random
+        self.size = config.get("map_size", 30) if grid is None else len(grid)  # Increased default map size to 30x30
         self.cell_size = config["cell_size"]
-        self.grid = np.zeros((self.size, self.size), dtype=int)  # 0: street, 1: barrier
+        self.grid = np.zeros((self.size, self.size), dtype=np.uint8)  # 0: street, 1: barrier
         self.cameras = []
+        # Spatial index of the cameras: exact cell lookups, plus buckets as
+        # wide as the longest vision range for "who can see this cell"
+        self._camera_cells = {}  # (x, y) -> index in self.cameras
+        self._camera_buckets = {}  # (bx, by) -> [camera]
+        self._bucket_size = 1
+        self.grid_version = 0  # Bumped whenever the grid layout changes
+        # Number of active cameras watching each cell
+        self.coverage = np.zeros((self.size, self.size), dtype=np.int32)
+        self.coverage_version = 0  # Bumped whenever the coverage changes
+        self.layout_version = 0  # Bumped when the player places or rotates a camera
+        # Cached distance to the nearest exit over unwatched streets
+        self._exit_distances = None
+        self._exit_distances_key = None
+        # Cluster abstraction for hierarchical pathfinding, with the regions
+        # whose coverage changed since it was last brought up to date
+        self._cluster_graph = None
+        self._cluster_dirty = []
         self.start_pos = None
         self.end_positions = []  # Exit positions at the edges
         
         # Lưu trữ vị trí của các địa điểm cho Prolog
         self.location_positions = {}
+        # Pre-rendered maze layer, redrawn only when the grid changes
+        self._static_surface = None
+        self._static_key = None
+        # All active vision cones composited into one layer, redrawn only
+        # when the coverage changes
+        self._vision_overlay = None
+        self._vision_overlay_key = None
+        # What was last reported as drawn, for dirty-rect rendering
+        self._drawn_key = None
+        self._drawn_cameras = {}
+        # Connected components of the streets, for reachability checks
+        self.connectivity = None
+        # Graph of junctions and corridors contracted from the grid, built on first use
+        self._junction_graph = None
+        # Street cells where three or more streets meet
+        self.junction_positions = np.zeros((0, 2), dtype=int)
         
-        self.generate_map()
+        if grid is None:
+            self.generate_map()
+        else:
+            self._use_grid(grid)
+
+    @classmethod
+    def from_grid(cls, grid, config, clock=None):
+        """Create a map around an existing grid, e.g. one loaded from a map corpus."""
+        return cls(config, grid=grid, clock=clock)
+
+    def _use_grid(self, grid):
+        """Set up a map around a given grid with the usual start and exit."""
+        self.grid[:, :] = grid
+        self.connectivity = None
+        self.start_pos = (1, 1)
+        self.end_positions = [(self.size-2, self.size-2)]
+        self._junction_graph = None
+        self.junction_positions = find_junctions(self.grid)
+        self._map_locations_for_prolog()
+        self._grid_changed()
 
     def generate_map(self):
         """Generate a maze-like map with multiple potential paths."""
-        # Create border barriers
-        for i in range(self.size):
-            for j in range(self.size):
-                # Create border
-                if (i == 0 or i == self.size-1 or j == 0 or j == self.size-1):
-                    self.grid[i][j] = 1  # Barrier
+        cache = None
+        if self.seed is not None:
+            self.rng = random.Random(self.seed)
+            if self.config.get("map_cache", True):
+                cache = MapCache(self.config.get("map_cache_dir", "data/map_cache"))
+                cached = cache.load(self.seed, self.size, self.config.get("maze_algorithm", "division"))
+                if cached is not None:
+                    self._load_cached(cached)
+                    return
+
+        # Start from open streets inside a border of barriers
+        self.grid[:, :] = 0
+        self.grid[[0, -1], :] = 1
+        self.grid[:, [0, -1]] = 1
 
         # Set start position at top-left (1,1)
         self.grid[1][1] = 0  # Ensure it's a street
@@ -40,15 +199,75 @@ class GameMap:
         self.end_positions = [(self.size-2, self.size-2)]
 
         # Create a complex maze pattern
-        self._generate_maze()
+        if self._generate_maze():
+            # Connected by construction; the index is built when first needed
+            self.connectivity = None
+        else:
+            self.connectivity = ConnectivityIndex(self.grid)
 
-        # Ensure there's at least one valid path
-        if not self.has_valid_path():
-            self._create_multiple_paths()
+            # Ensure there's at least one valid path
+            if not self.has_valid_path():
+                self._create_multiple_paths()
             
+        self._junction_graph = None
+        self.junction_positions = find_junctions(self.grid)
+
         # Cập nhật thông tin vị trí cho Prolog
         self._map_locations_for_prolog()
 
+        if cache is not None:
+            cache.save(self.seed, self)
+        self._grid_changed()
+
+    def _load_cached(self, cached):
+        """Restore a map generated earlier with the same seed."""
+        self.grid[:, :] = cached["grid"]
+        self.connectivity = None
+        self.start_pos = cached["start_pos"]
+        self.end_positions = cached["end_positions"]
+        self.location_positions = cached["location_positions"]
+        self.junction_positions = cached["junction_positions"]
+        self._junction_graph = None
+        self._grid_changed()
+
+    def _grid_changed(self):
+        """Grid changed, so camera visibility masks must be rebuilt."""
+        self.grid_version += 1
+        for camera in self.cameras:
+            camera.update_visibility(self)
+        self.rebuild_coverage()
+
+    def set_cells(self, cells, value):
+        """Set grid cells to street (0) or barrier (1), updating derived structures."""
+        for x, y in cells:
+            if value == 0:
+                self._open_cell(x, y)
+            else:
+                self.grid[x][y] = value
+        if value != 0:
+            # New walls can split components
+            self.connectivity = None
+        if self._junction_graph is not None:
+            # Only the corridors around the changed cells are traced again
+            self._junction_graph.update_cells(self.grid, cells)
+        self.junction_positions = find_junctions(self.grid)
+        self._grid_changed()
+
+    def get_junction_graph(self, build=True):
+        """Return the junction graph of the streets, building it on first use.
+
+        With build=False, returns None instead of building a graph that does
+        not exist yet.
+        """
+        if self._junction_graph is None and build:
+            self._junction_graph = JunctionGraph(self.grid, [self.start_pos] + self.end_positions)
+        return self._junction_graph
+
+    def adopt_junction_graph(self, graph, grid_version):
+        """Use a junction graph built by the planning worker, unless the grid changed since."""
+        if self._junction_graph is None and grid_version == self.grid_version:
+            self._junction_graph = graph
+
     def _map_locations_for_prolog(self):
         """Map positions to location names for Prolog."""
         # Đối với thành phố, ánh xạ vị trí quan trọng vào tên địa điểm
@@ -57,26 +276,15 @@ class GameMap:
             (self.size-2, self.size-2),  # End position (exit point - highway_entrance)
         ]
         
-        # Tìm thêm một số điểm quan trọng khác trên bản đồ
-        pathways = []
-        for x in range(1, self.size-1):
-            for y in range(1, self.size-1):
-                if self.grid[x][y] == 0:  # Là đường đi
-                    open_neighbors = 0
-                    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < self.size and 0 <= ny < self.size and self.grid[nx][ny] == 0:
-                            open_neighbors += 1
-                    
-                    # Nếu là giao lộ (có ít nhất 3 láng giềng là đường)
-                    if open_neighbors >= 3:
-                        pathways.append((x, y))
+        # Các giao lộ (ít nhất 3 láng giềng là đường) tính sẵn bằng find_junctions
+        pathways = self.junction_positions
         
         # Chọn ngẫu nhiên một số điểm làm các địa điểm quan trọng
         if len(pathways) >= 6:
-            important_positions.extend(random.sample(pathways, 6))
+            picks = self.rng.sample(range(len(pathways)), 6)
         else:
-            important_positions.extend(pathways)
+            picks = range(len(pathways))
+        important_positions.extend(tuple(pathways[i].tolist()) for i in picks)
         
         # Ánh xạ vào tên địa điểm
         location_names = [
@@ -98,81 +306,203 @@ class GameMap:
         return self.location_positions.get(location_name, (1, 1))  # Mặc định về city_center
 
     def _generate_maze(self):
-        """Generate a maze using recursive division algorithm."""
-        # Start with an empty grid (already created in init)
-        # Recursively divide the space
-        self._divide_maze(1, 1, self.size-2, self.size-2)
+        """Generate a maze with the algorithm selected by the maze_algorithm config.
+
+        - "division" (default): recursive division, fast at any map size
+        - "kruskal": randomized Kruskal, about as fast as division
+        - "wilson": loop-erased random walks giving a uniform spanning
+          tree; the walks run in Python, so this is meant for small maps
+          (about 0.4 s at 500x500 but over 3 s at 2000x2000)
+
+        Returns True if the start is already known to reach every exit.
+        """
+        algorithm = self.config.get("maze_algorithm", "division")
+        if algorithm == "division":
+            # Recursively divide the space (the grid starts empty)
+            self._divide_maze(1, 1, self.size-2, self.size-2)
+
+        # NumPy generator derived from the random module, so seeding random
+        # still reproduces the whole map
+        self._np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        if algorithm == "kruskal":
+            self._carve_maze(self._kruskal_passages())
+        elif algorithm == "wilson":
+            self._carve_maze(self._wilson_passages())
 
         # Add some random openings to create multiple paths
         self._add_random_openings()
+        # A spanning tree joins every lattice cell, and the start and exits
+        # are linked to it; openings only add streets
+        return algorithm in ("kruskal", "wilson")
 
     def _divide_maze(self, x1, y1, x2, y2):
-        """Recursively divide the maze to create a perfect maze structure."""
-        width = x2 - x1
-        height = y2 - y1
-        
-        # Base case: if region is too small, don't divide further
-        if width < 3 or height < 3:
-            return
-        
-        # Choose a random point to divide the maze horizontally
-        x = random.randint(x1 + 1, x2 - 1)
-        # Choose a random point to divide the maze vertically
-        y = random.randint(y1 + 1, y2 - 1)
-        
-        # Create walls
-        for i in range(x1, x2 + 1):
-            if self.grid[i][y] == 0:  # Only create wall if it's currently a path
-                self.grid[i][y] = 1
-        
-        for j in range(y1, y2 + 1):
-            if self.grid[x][j] == 0:  # Only create wall if it's currently a path
-                self.grid[x][j] = 1
-        
-        # Create random openings in each wall
-        # Don't create an opening at the intersection of the two walls
-        openings = []
-        
-        # Opening in the horizontal wall
-        horizontal_opening = random.randint(y1, y - 1)
-        self.grid[x][horizontal_opening] = 0
-        openings.append((x, horizontal_opening))
-        
-        horizontal_opening = random.randint(y + 1, y2)
-        self.grid[x][horizontal_opening] = 0
-        openings.append((x, horizontal_opening))
-        
-        # Opening in the vertical wall
-        vertical_opening = random.randint(x1, x - 1)
-        self.grid[vertical_opening][y] = 0
-        openings.append((vertical_opening, y))
-        
-        vertical_opening = random.randint(x + 1, x2)
-        self.grid[vertical_opening][y] = 0
-        openings.append((vertical_opening, y))
-        
-        # Recursively divide the resulting quadrants
-        self._divide_maze(x1, y1, x - 1, y - 1)  # Top-left
-        self._divide_maze(x + 1, y1, x2, y - 1)  # Top-right
-        self._divide_maze(x1, y + 1, x - 1, y2)  # Bottom-left
-        self._divide_maze(x + 1, y + 1, x2, y2)  # Bottom-right
+        """Divide the maze into chambers using an explicit stack.
+
+        Regions are processed in the same order as the recursive version, so
+        a given random seed draws the same walls. The whole map still differs
+        from the recursive generator's: the random openings added afterwards
+        come from a NumPy generator.
+        """
+        stack = [(x1, y1, x2, y2)]
+        while stack:
+            x1, y1, x2, y2 = stack.pop()
+            width = x2 - x1
+            height = y2 - y1
+
+            # Base case: if region is too small, don't divide further
+            if width < 3 or height < 3:
+                continue
+
+            # Choose a random point to divide the maze horizontally
+            x = self.rng.randint(x1 + 1, x2 - 1)
+            # Choose a random point to divide the maze vertically
+            y = self.rng.randint(y1 + 1, y2 - 1)
+
+            # Create walls
+            self.grid[x1:x2 + 1, y] = 1
+            self.grid[x, y1:y2 + 1] = 1
+
+            # Create random openings in each wall
+            # Don't create an opening at the intersection of the two walls
+            self.grid[x, self.rng.randint(y1, y - 1)] = 0
+            self.grid[x, self.rng.randint(y + 1, y2)] = 0
+            self.grid[self.rng.randint(x1, x - 1), y] = 0
+            self.grid[self.rng.randint(x + 1, x2), y] = 0
+
+            # Divide the resulting quadrants, pushed in reverse so the
+            # top-left one is handled first
+            stack.append((x + 1, y + 1, x2, y2))  # Bottom-right
+            stack.append((x1, y + 1, x - 1, y2))  # Bottom-left
+            stack.append((x + 1, y1, x2, y - 1))  # Top-right
+            stack.append((x1, y1, x - 1, y - 1))  # Top-left
+
+    def _lattice_shape(self):
+        """Rows and columns of the maze cells at odd grid coordinates."""
+        return (self.size - 1) // 2, (self.size - 1) // 2
+
+    def _kruskal_passages(self):
+        """Randomized Kruskal: join neighbouring cells in random order.
+
+        The random order gives every edge a distinct weight, so the spanning
+        tree is unique and Boruvka's rounds find the same passages as
+        Kruskal's union-find scan, but with whole-array operations: each
+        round every component takes its lightest edge to another component.
+        Returns two arrays of flat lattice indices; each pair is a passage.
+        """
+        rows, cols = self._lattice_shape()
+        count = rows * cols
+        index = np.arange(count).reshape(rows, cols)
+        first = np.concatenate([index[:, :-1].ravel(), index[:-1, :].ravel()])
+        second = np.concatenate([index[:, 1:].ravel(), index[1:, :].ravel()])
+        order = self._np_rng.permutation(len(first))
+        first, second = first[order], second[order]  # Edge i has weight i
+
+        # a and b hold the components at either end of the edges still
+        # crossing between components, kept in weight order
+        edges = np.arange(len(first))
+        a, b = first, second
+        kept = np.zeros(len(first), dtype=bool)
+        while len(edges):
+            # The first edge touching a component is its lightest
+            position = np.arange(len(edges))
+            lightest = np.full(count, len(edges))
+            np.minimum.at(lightest, a, position)
+            np.minimum.at(lightest, b, position)
+            roots = np.flatnonzero(lightest < len(edges))
+            chosen = lightest[roots]
+            kept[edges[chosen]] = True
+
+            # Point every component across its lightest edge; two components
+            # that picked the same edge point at each other, and the smaller
+            # one becomes the root
+            components = np.arange(count)
+            target = components.copy()
+            target[roots] = np.where(a[chosen] == roots, b[chosen], a[chosen])
+            mutual = (target[target] == components) & (components < target)
+            target[mutual] = components[mutual]
+            while True:
+                jumped = target[target]
+                if np.array_equal(jumped, target):
+                    break
+                target = jumped
+
+            # Number the merged components 0..count-1 so the arrays shrink
+            is_root = target == components
+            label = np.cumsum(is_root) - 1
+            count = int(is_root.sum())
+            a, b = label[target[a]], label[target[b]]
+            crossing = a != b
+            edges, a, b = edges[crossing], a[crossing], b[crossing]
+
+        return first[kept], second[kept]
+
+    def _wilson_passages(self):
+        """Wilson's algorithm: loop-erased random walks give a uniform spanning tree.
+
+        Returns two arrays of flat lattice indices; each pair is a passage.
+        """
+        rows, cols = self._lattice_shape()
+        count = rows * cols
+        in_tree = bytearray(count)
+        in_tree[0] = 1
+        step = [0] * count
+        offsets = (1, cols, -1, -cols)
+
+        directions = []
+        first, second = [], []
+        for cell in self._np_rng.permutation(count).tolist():
+            # Random walk until the tree is hit, remembering the last exit of
+            # each cell so that loops are erased
+            u = cell
+            while not in_tree[u]:
+                if not directions:
+                    directions = self._np_rng.integers(0, 4, 4096).tolist()
+                d = directions.pop()
+                r, c = divmod(u, cols)
+                if (d == 0 and c == cols - 1) or (d == 1 and r == rows - 1) or \
+                        (d == 2 and c == 0) or (d == 3 and r == 0):
+                    continue
+                step[u] = offsets[d]
+                u += offsets[d]
+
+            u = cell
+            while not in_tree[u]:
+                in_tree[u] = 1
+                first.append(u)
+                second.append(u + step[u])
+                u += step[u]
+
+        return np.array(first, dtype=int), np.array(second, dtype=int)
+
+    def _carve_maze(self, passages):
+        """Carve lattice cells and the passages between them into a walled grid."""
+        rows, cols = self._lattice_shape()
+        self.grid[1:-1, 1:-1] = 1
+        self.grid[1:2 * rows:2, 1:2 * cols:2] = 0
+
+        first, second = passages
+        # The wall between two lattice cells sits halfway between them
+        self.grid[(first // cols + second // cols) + 1, (first % cols + second % cols) + 1] = 0
+
+        # Link the start and exits to the nearest lattice cell
+        for x, y in [self.start_pos] + self.end_positions:
+            cx = x if x % 2 else x - 1
+            cy = y if y % 2 else y - 1
+            self.grid[cx:x + 1, y] = 0
+            self.grid[cx, cy:y + 1] = 0
 
     def _add_random_openings(self):
         """Add random openings to create multiple paths through the maze."""
         num_openings = int((self.size * self.size) * 0.05)  # 5% of cells will be openings
-        for _ in range(num_openings):
-            x = random.randint(1, self.size - 2)
-            y = random.randint(1, self.size - 2)
-            
-            # Don't create openings at start or end
-            if (x, y) != self.start_pos and (x, y) not in self.end_positions:
-                self.grid[x][y] = 0  # Create opening (path)
+        xs = self._np_rng.integers(1, self.size - 1, num_openings)
+        ys = self._np_rng.integers(1, self.size - 1, num_openings)
+        self.grid[xs, ys] = 0  # Create openings (path)
 
     def _create_multiple_paths(self):
         """Create multiple distinct paths from start to exit."""
         # Always ensure the exit is clear
         exit_pos = (self.size-2, self.size-2)
-        self.grid[exit_pos[0]][exit_pos[1]] = 0
+        self._open_cell(*exit_pos)
         self.end_positions = [exit_pos]
         
         sx, sy = self.start_pos
@@ -182,10 +512,10 @@ class GameMap:
         self._create_path(sx, sy, ex, ey)
         
         # Create 2-3 alternative paths
-        for _ in range(random.randint(2, 3)):
+        for _ in range(self.rng.randint(2, 3)):
             # Pick intermediate points
-            ix = random.randint(5, self.size - 5)
-            iy = random.randint(5, self.size - 5)
+            ix = self.rng.randint(5, self.size - 5)
+            iy = self.rng.randint(5, self.size - 5)
             
             # Create path segments
             self._create_path(sx, sy, ix, iy)
@@ -199,7 +529,7 @@ class GameMap:
         # Continue until we reach the target
         while (x, y) != (x2, y2):
             # Choose direction with bias towards target
-            if random.random() < 0.7:  # 70% chance to move towards target
+            if self.rng.random() < 0.7:  # 70% chance to move towards target
                 if x < x2:
                     x += 1
                 elif x > x2:
@@ -209,7 +539,7 @@ class GameMap:
                 elif y > y2:
                     y -= 1
             else:  # 30% chance to move randomly
-                direction = random.choice([(0, 1), (1, 0), (0, -1), (-1, 0)])
+                direction = self.rng.choice([(0, 1), (1, 0), (0, -1), (-1, 0)])
                 new_x = x + direction[0]
                 new_y = y + direction[1]
                 
@@ -218,66 +548,237 @@ class GameMap:
                     x, y = new_x, new_y
             
             # Clear this cell
-            self.grid[x][y] = 0
+            self._open_cell(x, y)
+
+    def _open_cell(self, x, y):
+        """Turn a cell into street, keeping the connectivity index up to date."""
+        self.grid[x][y] = 0
+        if self.connectivity is not None:
+            self.connectivity.open_cell(x, y)
 
     def has_valid_path(self):
-        """Check if there's a valid path from start to any exit using BFS."""
+        """Check if there's a valid path from start to any exit.
+
+        Looks up the connected components of the streets instead of
+        searching the grid.
+        """
         if not self.start_pos or not self.end_positions:
             return False
+        if self.connectivity is None:
+            self.connectivity = ConnectivityIndex(self.grid)
 
-        visited = set()
-        queue = [self.start_pos]
-        visited.add(self.start_pos)
-
-        while queue:
-            x, y = queue.pop(0)
-            if (x, y) in self.end_positions:
-                return True
+        exits = {self.connectivity.component(x, y) for x, y in self.end_positions}
+        exits.discard(-1)
+        if self.start_pos in self.end_positions:
+            return True
 
-            # Check all four directions
+        x, y = self.start_pos
+        if self.grid[x][y] == 0:
+            starts = {self.connectivity.component(x, y)}
+        else:
+            # The walk starts on the start cell even if it is walled in, so
+            # look at the components it can step into
+            starts = set()
             for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
                 nx, ny = x + dx, y + dy
-                if (0 <= nx < self.size and 0 <= ny < self.size and 
-                    self.grid[nx][ny] == 0 and (nx, ny) not in visited):
-                    queue.append((nx, ny))
-                    visited.add((nx, ny))
-
-        return False
+                if 0 <= nx < self.size and 0 <= ny < self.size:
+                    starts.add(self.connectivity.component(nx, ny))
+        return bool(starts & exits)
 
     def add_camera(self, pos):
-        """Add a camera at the specified position if it's a barrier."""
+        """Add a camera at the specified position if it's a barrier without one."""
         x, y = pos
-        if 0 <= x < self.size and 0 <= y < self.size and self.grid[x][y] == 1:
-            camera = Camera(x, y, self.config)
+        if 0 <= x < self.size and 0 <= y < self.size and self.grid[x][y] == 1 \
+                and (x, y) not in self._camera_cells:
+            camera = Camera(x, y, self.config, game_map=self)
+            self._camera_cells[(x, y)] = len(self.cameras)
             self.cameras.append(camera)
+            self._index_camera(camera)
+            self.layout_version += 1
+            if camera.active:
+                self._apply_camera_coverage(camera, 1)
             return True
         return False
 
-    def render(self, screen):
-        """Render the map on the screen."""
+    def _index_camera(self, camera):
+        """Put a camera in its bucket, regrouping all of them if its range is the longest yet."""
+        if camera.vision_range > self._bucket_size:
+            self._bucket_size = camera.vision_range
+            self._camera_buckets = {}
+            for other in self.cameras:
+                if other is not camera:
+                    self._camera_buckets.setdefault(self._bucket_of(other.x, other.y), []).append(other)
+        self._camera_buckets.setdefault(self._bucket_of(camera.x, camera.y), []).append(camera)
+
+    def _bucket_of(self, x, y):
+        return x // self._bucket_size, y // self._bucket_size
+
+    def find_camera(self, pos):
+        """Index in self.cameras of the camera at pos, or None."""
+        return self._camera_cells.get(tuple(pos))
+
+    def cameras_near(self, x, y):
+        """Cameras whose vision range reaches the cell (x, y), ignoring walls and direction.
+
+        Only the buckets around the cell are visited; a bucket is as wide as
+        the longest vision range, so the 3x3 block around it is enough.
+        """
+        bx, by = self._bucket_of(x, y)
+        near = []
+        for i in range(bx - 1, bx + 2):
+            for j in range(by - 1, by + 2):
+                for camera in self._camera_buckets.get((i, j), ()):
+                    if max(abs(camera.x - x), abs(camera.y - y)) <= camera.vision_range:
+                        near.append(camera)
+        return near
+
+    def watching_cameras(self, x, y):
+        """Active cameras that currently see the cell (x, y)."""
+        return [camera for camera in self.cameras_near(x, y)
+                if camera.active and camera.get_visibility_mask(self)[x, y]]
+
+    def _apply_camera_coverage(self, camera, sign):
+        """Add (sign=1) or remove (sign=-1) a camera's mask from the coverage."""
+        self.coverage[camera.get_visibility_mask(self)] += sign
+        self.coverage_version += 1
+        if self._cluster_graph is not None:
+            r = camera.vision_range
+            self._cluster_dirty.append((camera.x - r, camera.y - r, camera.x + r, camera.y + r))
+
+    def rebuild_coverage(self):
+        """Recompute the coverage layer from scratch for all active cameras."""
+        self.coverage = np.zeros((self.size, self.size), dtype=np.int32)
+        for camera in self.cameras:
+            if camera.active:
+                self.coverage[camera.get_visibility_mask(self)] += 1
+        self.coverage_version += 1
+        self._cluster_graph = None
+
+    def is_covered(self, x, y):
+        """Check if any active camera currently sees the cell (x, y)."""
+        return self.coverage[x, y] > 0
+
+    def get_passable_mask(self):
+        """Return a boolean mask of street cells not seen by any active camera."""
+        return (self.grid == 0) & (self.coverage == 0)
+
+    def camera_schedules(self, now=None):
+        """Snapshot of every camera's cycle for coverage_phases.
+
+        One (visibility mask, scan time, rest time, seconds into the cycle)
+        tuple per camera, with the position taken at clock time now. The
+        masks are replaced, never changed, when cameras move, so the
+        snapshot can be read on another thread.
+        """
+        if now is None:
+            now = self.clock.now()
+        return [
+            (camera.get_visibility_mask(self), camera.scan_time, camera.rest_time,
+             camera.cycle_position() + now - camera.last_update)
+            for camera in self.cameras
+        ]
+
+    def get_coverage_phases(self, step_time, max_period=256):
+        """Predict the coverage for each step of the cameras' scan/rest cycle (see coverage_phases)."""
+        return coverage_phases(self.camera_schedules(), self.size, step_time, max_period)
+
+    def get_exit_distances(self):
+        """Return the distance-to-nearest-exit field, rebuilding it if stale.
+
+        The field is a multi-source BFS from the exits over street cells that
+        no active camera sees; -1 marks cells with no hidden route out.
+        """
+        key = (self.grid_version, self.coverage_version)
+        if self._exit_distances is None or self._exit_distances_key != key:
+            self._exit_distances = distance_field(self.get_passable_mask(), self.end_positions)
+            self._exit_distances_key = key
+        return self._exit_distances
+
+    def get_cluster_graph(self, build=True):
+        """Return the HPA* cluster graph over unwatched streets.
+
+        After cameras are placed, rotated or switch state, only the clusters
+        around them are recomputed. With build=False, returns None instead
+        of building a graph that does not exist yet.
+        """
+        if self._cluster_graph is None:
+            if not build:
+                return None
+            self._cluster_graph = ClusterGraph(
+                self.get_passable_mask(),
+                self.config.get("hpa_cluster_size", 16)
+            )
+        elif self._cluster_dirty:
+            self._cluster_graph.update(self.get_passable_mask(), self._cluster_dirty)
+        self._cluster_dirty = []
+        return self._cluster_graph
+
+    def adopt_cluster_graph(self, graph, grid_version):
+        """Use a cluster graph built from an earlier snapshot of this map.
+
+        Cells whose passability changed since the snapshot are queued as
+        dirty regions, so the next get_cluster_graph() catches it up.
+        """
+        if self._cluster_graph is not None or grid_version != self.grid_version:
+            return
+        changed = np.argwhere(graph.passable != self.get_passable_mask())
+        self._cluster_graph = graph
+        self._cluster_dirty = [(x, y, x, y) for x, y in changed.tolist()]
+
+    def path_to_exit(self, pos):
+        """Get a hidden path from pos to the nearest exit by following the distance field."""
+        return follow_distance_field(self.get_exit_distances(), pos)
+
+    def _render_static(self):
+        """Draw the maze (border, walls, streets and grid lines) into an off-screen surface."""
         colors = self.config["colors"]
+        cell = self.cell_size
+
+        # One colour per cell, then scaled up to pixels
+        cell_colors = np.empty((self.size, self.size, 3), dtype=np.uint8)
+        cell_colors[:] = colors["street"][:3]
+        cell_colors[self.grid == 1] = (50, 50, 150)  # Blue-gray walls
+        cell_colors[[0, -1], :] = (0, 0, 0)  # Draw border as black
+        cell_colors[:, [0, -1]] = (0, 0, 0)
+        pixels = np.repeat(np.repeat(cell_colors, cell, axis=0), cell, axis=1)
+
+        # Grid lines: the one-pixel outline of every cell
+        edge = np.zeros(self.size * cell, dtype=bool)
+        edge[::cell] = True
+        edge[cell - 1::cell] = True
+        pixels[edge, :] = (200, 200, 200)
+        pixels[:, edge] = (200, 200, 200)
+
+        # surfarray is indexed (x, y) in screen space, i.e. (col, row)
+        return pygame.surfarray.make_surface(pixels.transpose(1, 0, 2))
 
-        # Draw the grid
-        for x in range(self.size):
-            for y in range(self.size):
-                rect = pygame.Rect(
-                    y * self.cell_size,
-                    x * self.cell_size,
-                    self.cell_size,
-                    self.cell_size
-                )
-
-                # Check if it's a border
-                if (x == 0 or x == self.size-1 or y == 0 or y == self.size-1):
-                    # Draw border as black
-                    pygame.draw.rect(screen, (0, 0, 0), rect)
-                elif self.grid[x][y] == 1:  # Barrier - draw as wall
-                    pygame.draw.rect(screen, (50, 50, 150), rect)  # Blue-gray walls
-                else:  # Street
-                    pygame.draw.rect(screen, colors["street"], rect)
-
-                # Draw grid lines
-                pygame.draw.rect(screen, (200, 200, 200), rect, 1)
+    def render(self, screen):
+        """Render the map on the screen."""
+        with profile("map_render"):
+            self._render_layout(screen)
+
+        # Draw the vision of every active camera in one blit, then the cameras
+        with profile("camera_overlays"):
+            screen.blit(self._get_vision_overlay(), (0, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+            for camera in self.cameras:
+                camera.render(screen, self)
+
+    def get_static_surface(self):
+        """Return the pre-rendered maze layer, drawing it if the grid changed.
+
+        Needs no display, so a map generated in the background can be
+        drawn there too.
+        """
+        # The maze itself only changes with the grid, so draw it once and blit it
+        key = (self.grid_version, self.cell_size)
+        if self._static_surface is None or self._static_key != key:
+            self._static_surface = self._render_static()
+            self._static_key = key
+        return self._static_surface
+
+    def _render_layout(self, screen):
+        """Draw the maze, the start and the exits."""
+        screen.blit(self.get_static_surface(), (0, 0))
 
         # Draw start position
         if self.start_pos:
@@ -300,15 +801,49 @@ class GameMap:
             )
             pygame.draw.rect(screen, (255, 165, 0), end_rect)  # Orange for exit
 
-        # Draw cameras and their vision
-        for camera in self.cameras:
-            camera.render(screen, self)
+    def get_dirty_rects(self):
+        """Screen rects that changed since the last call.
+
+        The whole map after the grid changed, otherwise the area of every
+        camera that was placed, rotated or switched between scan and rest.
+        """
+        key = (self.grid_version, self.cell_size)
+        states = {id(camera): (camera.active, camera.direction) for camera in self.cameras}
+        if key != self._drawn_key:
+            rects = [pygame.Rect(0, 0, self.size * self.cell_size, self.size * self.cell_size)]
+        else:
+            rects = [camera.get_screen_rect() for camera in self.cameras
+                     if self._drawn_cameras.get(id(camera)) != states[id(camera)]]
+        self._drawn_key = key
+        self._drawn_cameras = states
+        return rects
+
+    def _get_vision_overlay(self):
+        """Return the layer of all active vision cones, rebuilding it if the coverage changed."""
+        key = (self.coverage_version, len(self.cameras), self.cell_size)
+        if self._vision_overlay is None or self._vision_overlay_key != key:
+            pixels = self.size * self.cell_size
+            overlay = pygame.Surface((pixels, pixels), pygame.SRCALPHA)
+            color = self.config["colors"].get("camera_vision", (255, 200, 200, 100))
+            for camera in self.cameras:
+                if camera.active:
+                    sprite, offset = get_cone_sprite(
+                        camera.vision_range, camera.direction, camera.vision_angle, self.cell_size, color
+                    )
+                    overlay.blit(
+                        sprite,
+                        (camera.y * self.cell_size + offset, camera.x * self.cell_size + offset),
+                        special_flags=pygame.BLEND_PREMULTIPLIED
+                    )
+            self._vision_overlay = overlay
+            self._vision_overlay_key = key
+        return self._vision_overlay
 
 
 class Camera:
     """Class representing a surveillance camera with a field of view."""
 
-    def __init__(self, x, y, config):
+    def __init__(self, x, y, config, game_map=None, clock=None):
         self.x = x
         self.y = y
         self.config = config
@@ -322,81 +857,118 @@ class Camera:
         self.scan_time = config.get("camera_scan_time", 3.0)  # Seconds to scan
         self.rest_time = config.get("camera_rest_time", 1.0)  # Seconds to rest
         self.timer = 0.0  # Current timer
-        self.last_update = time.time()  # Last update time
+        # Time source shared with the map, so simulations can run faster than real time
+        if clock is None:
+            clock = game_map.clock if game_map is not None else RealTimeClock()
+        self.clock = clock
+        self.last_update = self.clock.now()  # Last update time
+
+        # Precomputed visibility mask over the grid, rebuilt only when the
+        # camera is placed, rotated or the grid changes
+        self.game_map = game_map
+        self.visibility_mask = None
+        self._mask_grid_version = None
+        if game_map is not None:
+            self.update_visibility(game_map)
 
     def update(self):
         """Update camera state based on elapsed time."""
-        current_time = time.time()
+        current_time = self.clock.now()
         elapsed = current_time - self.last_update
         self.last_update = current_time
         
         # Update timer
         self.timer += elapsed
-        
-        # Check if we need to switch states
-        if self.active and self.timer >= self.scan_time:
-            self.active = False
-            self.timer = 0.0
-        elif not self.active and self.timer >= self.rest_time:
-            self.active = True
+
+        if self.scan_time + self.rest_time <= 0:
+            # A cycle of no length never rests (and the loop below would not end)
+            self.set_active(True)
             self.timer = 0.0
+            return
+        
+        # Switch states, keeping the overshoot so the cycle stays on the
+        # schedule predicted by is_active_at
+        while True:
+            if self.active and self.timer >= self.scan_time:
+                self.set_active(False)
+                self.timer -= self.scan_time
+            elif not self.active and self.timer >= self.rest_time:
+                self.set_active(True)
+                self.timer -= self.rest_time
+            else:
+                break
+
+    def cycle_position(self):
+        """Seconds into the scan/rest cycle as of the last update."""
+        return self.timer if self.active else self.scan_time + self.timer
+
+    def is_active_at(self, elapsed):
+        """Predict whether the camera will be scanning elapsed seconds from the last update."""
+        return _scanning_at(self.cycle_position() + elapsed, self.scan_time, self.rest_time)
+
+    def set_active(self, active):
+        """Switch between scanning and resting, keeping the map coverage in sync."""
+        if active == self.active:
+            return
+        self.active = active
+        if self.game_map is not None:
+            self.game_map._apply_camera_coverage(self, 1 if active else -1)
 
     def rotate(self, clockwise=True):
         """Rotate the camera direction."""
+        if self.game_map is not None and self.active:
+            self.game_map._apply_camera_coverage(self, -1)
+
         if clockwise:
             self.direction = (self.direction + 90) % 360
         else:
             self.direction = (self.direction - 90) % 360
 
+        if self.game_map is not None:
+            self.game_map.layout_version += 1
+            self.update_visibility(self.game_map)
+            if self.active:
+                self.game_map._apply_camera_coverage(self, 1)
+
+    def update_visibility(self, game_map):
+        """Rebuild the visibility mask of this camera for the current grid."""
+        # Either a single shadowcasting sweep over the vision cone, or one
+        # batched test of the shared ray table
+        if self.config.get("camera_fov_engine", "shadowcast") == "raycast":
+            fov_engine = raycast_fov_mask
+        else:
+            fov_engine = compute_fov_mask
+
+        self.visibility_mask = fov_engine(
+            game_map.grid,
+            (self.x, self.y),
+            self.vision_range,
+            self.direction,
+            self.vision_angle
+        )
+        self._mask_grid_version = game_map.grid_version
+
+    def get_visibility_mask(self, game_map):
+        """Return the visibility mask, rebuilding it if the grid has changed."""
+        if (self.visibility_mask is None or
+                self._mask_grid_version != game_map.grid_version or
+                self.visibility_mask.shape != game_map.grid.shape):
+            self.update_visibility(game_map)
+        return self.visibility_mask
+
     def can_see(self, x, y, game_map):
         """Check if the camera can see the position (x, y)."""
         # Camera cannot see if it's in rest mode
         if not self.active:
             return False
-            
-        # Calculate distance to the target
-        dx = y - self.y  # Swapped because grid is row/col but rendering is x/y
-        dy = x - self.x
 
-        # Check if within circular range
-        distance = (dx**2 + dy**2)**0.5
-        if distance > self.vision_range:
+        if not (0 <= x < game_map.size and 0 <= y < game_map.size):
             return False
 
-        # Check line of sight (no barriers in between)
-        points = self._get_line(self.x, self.y, x, y)
-        for px, py in points[1:-1]:  # Skip start and end points
-            if 0 <= px < game_map.size and 0 <= py < game_map.size:
-                if game_map.grid[px][py] == 1:  # Barrier blocks vision
-                    return False
-
-        return True
-
-    def _get_line(self, x0, y0, x1, y1):
-        """Get a list of points in a line from (x0, y0) to (x1, y1)."""
-        points = []
-        dx = abs(x1 - x0)
-        dy = abs(y1 - y0)
-        sx = 1 if x0 < x1 else -1
-        sy = 1 if y0 < y1 else -1
-        err = dx - dy
-
-        while True:
-            points.append((x0, y0))
-            if x0 == x1 and y0 == y1:
-                break
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x0 += sx
-            if e2 < dx:
-                err += dx
-                y0 += sy
-
-        return points
+        return bool(self.get_visibility_mask(game_map)[x, y])
 
     def render(self, screen, game_map):
-        """Render the camera and its vision cone."""
+        """Render the camera and the outline of its vision cone."""
         colors = self.config["colors"]
 
         # Draw camera
@@ -418,33 +990,27 @@ class Camera:
         end_y = center_y + radius * np.sin(angle_rad)
         pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (end_x, end_y), 2)
 
-        # Only draw vision if camera is active
+        # The filled vision cone is part of the map's vision overlay
         if self.active:
-            # Draw vision cone as a circle
-            vision_surface = pygame.Surface(
-                (game_map.size * self.cell_size, game_map.size * self.cell_size), 
-                pygame.SRCALPHA
-            )
-
-            # Calculate vision radius in pixels
-            vision_radius = self.vision_range * self.cell_size
-
-            # Draw a semi-transparent circle for the camera's vision
-            pygame.draw.circle(
-                vision_surface,
-                colors.get("camera_vision", (255, 200, 200, 100)),
-                (center_x, center_y),
-                vision_radius
-            )
-
-            # Apply vision surface to the main screen
-            screen.blit(vision_surface, (0, 0))
-
             # Draw the perimeter of the vision range
-            pygame.draw.circle(
+            vision_radius = self.vision_range * self.cell_size
+            pygame.draw.polygon(
                 screen,
                 (255, 0, 0, 128),  # Semi-transparent red
-                (center_x, center_y),
-                vision_radius,
+                self._get_cone_points(center_x, center_y, vision_radius),
                 1  # Line width
             )
+
+    def get_screen_rect(self):
+        """Screen area covered by the camera and its vision cone."""
+        reach = self.vision_range * self.cell_size + 2
+        return pygame.Rect(
+            self.y * self.cell_size - reach,
+            self.x * self.cell_size - reach,
+            self.cell_size + 2 * reach,
+            self.cell_size + 2 * reach
+        )
+
+    def _get_cone_points(self, center_x, center_y, radius, steps=16):
+        """Get the polygon outline of the vision cone in screen coordinates."""
+        return _cone_points(center_x, center_y, radius, self.direction, self.vision_angle, steps)
@@ -0,0 +1,62 @@
+"""
+On-disk cache of generated maps, keyed by (seed, size, algorithm).
+"""
+import os
+import numpy as np
+
+# Bump when the generators change so stale maps are not reused
+CACHE_VERSION = 2
+
+
+class MapCache:
+    """Stores generated grids and their positions as compressed .npz files."""
+
+    def __init__(self, directory="data/map_cache"):
+        self.directory = directory
+
+    def _path(self, seed, size, algorithm):
+        return os.path.join(self.directory, f"map_v{CACHE_VERSION}_{algorithm}_{size}_{seed}.npz")
+
+    def load(self, seed, size, algorithm):
+        """Return the cached map data as a dict, or None if it is not cached."""
+        path = self._path(seed, size, algorithm)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                size = int(data["size"])
+                return {
+                    "grid": np.unpackbits(data["grid"], axis=1, count=size),
+                    "start_pos": tuple(data["start_pos"].tolist()),
+                    "end_positions": [tuple(p) for p in data["end_positions"].tolist()],
+                    "location_positions": dict(zip(
+                        data["location_names"].tolist(),
+                        [tuple(p) for p in data["location_cells"].tolist()]
+                    )),
+                    "junction_positions": data["junction_positions"]
+                }
+        except Exception as e:
+            print(f"Lỗi khi tải bản đồ từ cache: {e}")
+            return None
+
+    def save(self, seed, game_map):
+        """Save a generated map under its (seed, size, algorithm) key."""
+        algorithm = game_map.config.get("maze_algorithm", "division")
+        path = self._path(seed, game_map.size, algorithm)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = list(game_map.location_positions)
+            np.savez_compressed(
+                path,
+                size=game_map.size,
+                grid=np.packbits(game_map.grid, axis=1),  # One bit per cell
+                start_pos=np.array(game_map.start_pos),
+                end_positions=np.array(game_map.end_positions).reshape(-1, 2),
+                location_names=np.array(names, dtype=str),
+                location_cells=np.array([game_map.location_positions[n] for n in names]).reshape(-1, 2),
+                junction_positions=game_map.junction_positions
+            )
+            return True
+        except Exception as e:
+            print(f"Lỗi khi lưu bản đồ vào cache: {e}")
+            return False
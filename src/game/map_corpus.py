@@ -0,0 +1,58 @@
+"""
+Corpus of pre-generated maps stored bit-packed and memory-mapped from disk.
+"""
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+from src.game.map import GameMap
+
+
+class MapCorpus:
+    """A file of same-sized maze grids, one bit per cell.
+
+    The grids live in a .npy file that is memory-mapped read-only, so only
+    the maps actually used are paged into memory. A JSON file next to it
+    records the map size and the seed of each map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(self._meta_path(path), 'r') as f:
+            meta = json.load(f)
+        self.size = meta["size"]
+        self.seeds = meta["seeds"]
+        self.grids = np.load(path, mmap_mode='r')
+
+    @staticmethod
+    def _meta_path(path):
+        return os.path.splitext(path)[0] + ".json"
+
+    @classmethod
+    def build(cls, path, config, count, first_seed=0):
+        """Generate count seeded maps with config and write them as a corpus."""
+        size = config.get("map_size", 30)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        grids = open_memmap(path, mode='w+', dtype=np.uint8, shape=(count, size, (size + 7) // 8))
+        seeds = list(range(first_seed, first_seed + count))
+        # Corpus maps are written here once; skip the per-map cache
+        map_config = dict(config, map_cache=False)
+        for i, seed in enumerate(seeds):
+            grids[i] = np.packbits(GameMap(map_config, seed=seed).grid, axis=1)
+        grids.flush()
+        del grids
+
+        with open(cls._meta_path(path), 'w') as f:
+            json.dump({"size": size, "seeds": seeds}, f)
+        return cls(path)
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def get_grid(self, index):
+        """Unpack one grid into a uint8 array (0: street, 1: barrier)."""
+        return np.unpackbits(self.grids[index], axis=1, count=self.size)
+
+    def load_map(self, index, config):
+        """Create a GameMap from one corpus grid."""
+        return GameMap.from_grid(self.get_grid(index), config)
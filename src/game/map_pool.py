@@ -0,0 +1,59 @@
+"""
+Maps generated ahead of time on a background thread.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src.game.map import GameMap
+
+
+def _build_map(config, seed, clock, prerender):
+    """Generate one map (runs on the pool's worker thread)."""
+    game_map = GameMap(config, seed=seed, clock=clock)
+    if prerender:
+        game_map.get_static_surface()
+    return game_map
+
+
+class MapPool:
+    """Keeps the next few maps generated so switching maps is instant.
+
+    Maps are produced in order on one worker thread. With a seed they come
+    from consecutive seeds starting at next_seed, exactly like generating
+    them one at a time; without one every map is random.
+    """
+
+    def __init__(self, config, clock=None, count=2, next_seed=None, prerender=True):
+        self.config = config
+        self.clock = clock
+        self.count = max(1, count)
+        self.next_seed = next_seed
+        self.prerender = prerender
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-pool")
+        self._pending = deque()  # Futures in the order their maps are handed out
+        self._fill()
+
+    def _fill(self):
+        """Queue generation until count maps are ready or on their way."""
+        while len(self._pending) < self.count:
+            seed = self.next_seed
+            if self.next_seed is not None:
+                self.next_seed += 1
+            future = self._executor.submit(_build_map, self.config, seed, self.clock, self.prerender)
+            self._pending.append(future)
+
+    def ready(self):
+        """Number of maps that can be taken without waiting."""
+        return sum(1 for future in self._pending if future.done())
+
+    def take(self):
+        """Return the next map, waiting only if it is still being generated."""
+        future = self._pending.popleft()
+        self._fill()
+        return future.result()
+
+    def shutdown(self):
+        """Stop generating; a map already being built is finished and dropped."""
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,427 @@
+"""
+Shared grid pathfinding used by the game agent and the offline trainer.
+"""
+import heapq
+import math
+from collections import deque
+import numpy as np
+
+# 4-connected moves on the grid
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def _reconstruct_path(parent, index, width):
+    """Walk the flat parent pointers back from index to the start."""
+    path = []
+    while index != -1:
+        path.append((index // width, index % width))
+        index = int(parent[index])
+    path.reverse()
+    return path
+
+
+def _manhattan_heuristic(goals):
+    """Build a heuristic returning the Manhattan distance to the nearest goal."""
+    if len(goals) == 1:
+        gx, gy = goals[0]
+        return lambda x, y: abs(x - gx) + abs(y - gy)
+    return lambda x, y: min(abs(x - gx) + abs(y - gy) for gx, gy in goals)
+
+
+def astar(passable, start, goals):
+    """Find a shortest 4-connected path from start to the nearest goal.
+
+    passable is a boolean grid of cells that may be entered. The start cell is
+    always allowed. Returns the path as a list of (x, y) including both ends,
+    or [] if no goal is reachable.
+    """
+    height, width = passable.shape
+    goals = [(gx, gy) for gx, gy in goals if 0 <= gx < height and 0 <= gy < width]
+    if not goals or start is None:
+        return []
+
+    sx, sy = start
+    if not (0 <= sx < height and 0 <= sy < width):
+        return []
+
+    goal_indices = {gx * width + gy for gx, gy in goals}
+    heuristic = _manhattan_heuristic(goals)
+    open_cells = passable.ravel().tolist()
+
+    # Flat per-cell search state
+    parent = np.full(height * width, -1, dtype=np.int64)
+    cost = np.full(height * width, np.iinfo(np.int64).max, dtype=np.int64)
+    closed = np.zeros(height * width, dtype=bool)
+
+    start_index = sx * width + sy
+    cost[start_index] = 0
+    h = heuristic(sx, sy)
+    frontier = [(h, h, start_index)]
+
+    while frontier:
+        _, _, index = heapq.heappop(frontier)
+        if closed[index]:
+            continue
+        closed[index] = True
+
+        if index in goal_indices:
+            return _reconstruct_path(parent, index, width)
+
+        x, y = divmod(index, width)
+        new_cost = int(cost[index]) + 1
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < height and 0 <= ny < width):
+                continue
+            n_index = nx * width + ny
+            if not open_cells[n_index] or closed[n_index] or new_cost >= cost[n_index]:
+                continue
+            cost[n_index] = new_cost
+            parent[n_index] = index
+            h = heuristic(nx, ny)
+            heapq.heappush(frontier, (new_cost + h, h, n_index))
+
+    return []
+
+
+def distance_field(passable, sources):
+    """Compute the 4-connected step distance from every cell to the nearest source.
+
+    Uses a multi-source BFS over passable cells. Returns an int32 array where
+    unreachable and blocked cells hold -1.
+    """
+    height, width = passable.shape
+    open_cells = passable.ravel().tolist()
+    # Plain Python list for fast scalar access inside the loop
+    distances = [-1] * (height * width)
+
+    queue = deque()
+    for sx, sy in sources:
+        if 0 <= sx < height and 0 <= sy < width and open_cells[sx * width + sy]:
+            index = sx * width + sy
+            if distances[index] == -1:
+                distances[index] = 0
+                queue.append(index)
+
+    while queue:
+        index = queue.popleft()
+        x, y = divmod(index, width)
+        next_distance = distances[index] + 1
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < height and 0 <= ny < width:
+                n_index = nx * width + ny
+                if open_cells[n_index] and distances[n_index] == -1:
+                    distances[n_index] = next_distance
+                    queue.append(n_index)
+
+    return np.array(distances, dtype=np.int32).reshape(height, width)
+
+
+def follow_distance_field(field, start):
+    """Follow the distance gradient from start down to a source.
+
+    The start cell may itself be blocked, in which case the walk begins at its
+    closest reachable neighbour. Returns the path including both ends, or []
+    if no source is reachable.
+    """
+    height, width = field.shape
+    x, y = start
+    if not (0 <= x < height and 0 <= y < width):
+        return []
+
+    path = [(x, y)]
+    if field[x, y] < 0:
+        neighbours = [(x + dx, y + dy) for dx, dy in DIRECTIONS
+                      if 0 <= x + dx < height and 0 <= y + dy < width and field[x + dx, y + dy] >= 0]
+        if not neighbours:
+            return []
+        x, y = min(neighbours, key=lambda pos: field[pos])
+        path.append((x, y))
+
+    while field[x, y] > 0:
+        target = field[x, y] - 1
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < height and 0 <= ny < width and field[nx, ny] == target:
+                x, y = nx, ny
+                break
+        path.append((x, y))
+
+    return path
+
+
+class DStarLite:
+    """Incremental planner (D* Lite) searching backwards from the exits.
+
+    g holds the distance from each cell to the nearest goal. When cells flip
+    between passable and blocked, only the affected part of the search is
+    repaired, focused on the agent's current position by the heuristic.
+    """
+
+    def __init__(self, passable, goals, start, distances=None):
+        """Create the planner, optionally seeded from a converged distance field."""
+        self.height, self.width = passable.shape
+        # The mask is diffed against new grids in bulk; the list serves the
+        # per-cell lookups of the search, which are slow on a numpy array
+        self.mask = passable.ravel().astype(bool)
+        self.passable = self.mask.tolist()
+        self.goals = {gx * self.width + gy for gx, gy in goals
+                      if 0 <= gx < self.height and 0 <= gy < self.width}
+        self.start = start
+        self.last_start = start
+        self.km = 0
+
+        size = self.height * self.width
+        self.g = [math.inf] * size
+        self.rhs = [math.inf] * size
+        self.queue = []
+        self.queued = {}  # index -> key currently valid in the queue
+
+        if distances is not None:
+            # A distance field is already a fully consistent solution
+            for index, distance in enumerate(distances.ravel().tolist()):
+                if distance >= 0:
+                    self.g[index] = self.rhs[index] = distance
+            for index in self.goals:
+                if self.g[index] != 0:
+                    self.rhs[index] = 0
+                    self._push(index)
+        else:
+            for index in self.goals:
+                self.rhs[index] = 0
+                self._push(index)
+        self.compute_shortest_path()
+
+    def _heuristic(self, index):
+        x, y = divmod(index, self.width)
+        return abs(x - self.start[0]) + abs(y - self.start[1])
+
+    def _key(self, index):
+        best = min(self.g[index], self.rhs[index])
+        return (best + self._heuristic(index) + self.km, best)
+
+    def _push(self, index):
+        key = self._key(index)
+        self.queued[index] = key
+        heapq.heappush(self.queue, (key, index))
+
+    def _neighbours(self, index):
+        x, y = divmod(index, self.width)
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.height and 0 <= ny < self.width:
+                yield nx * self.width + ny
+
+    def _update_vertex(self, index):
+        if index not in self.goals:
+            # Only passable neighbours can be stepped into
+            self.rhs[index] = min(
+                (self.g[n] + 1 for n in self._neighbours(index) if self.passable[n]),
+                default=math.inf
+            )
+        self.queued.pop(index, None)
+        if self.g[index] != self.rhs[index]:
+            self._push(index)
+
+    def _top_key(self):
+        # Drop entries superseded by a later push or removal
+        while self.queue:
+            key, index = self.queue[0]
+            if self.queued.get(index) == key:
+                return key
+            heapq.heappop(self.queue)
+        return (math.inf, math.inf)
+
+    def compute_shortest_path(self):
+        """Expand inconsistent cells until the start cell is consistent."""
+        start = self.start[0] * self.width + self.start[1]
+        while (self._top_key() < self._key(start) or
+               self.rhs[start] != self.g[start]):
+            if not self.queue:
+                break
+            key, index = heapq.heappop(self.queue)
+            del self.queued[index]
+
+            new_key = self._key(index)
+            if key < new_key:
+                self._push(index)
+            elif self.g[index] > self.rhs[index]:
+                self.g[index] = self.rhs[index]
+                for n in self._neighbours(index):
+                    self._update_vertex(n)
+            else:
+                self.g[index] = math.inf
+                self._update_vertex(index)
+                for n in self._neighbours(index):
+                    self._update_vertex(n)
+
+    def move_start(self, start):
+        """Move the search start to the agent's new position."""
+        self.start = start
+        self.km += abs(start[0] - self.last_start[0]) + abs(start[1] - self.last_start[1])
+        self.last_start = start
+
+    def update_passable(self, passable):
+        """Apply a new passable grid, repairing only around the cells that flipped."""
+        passable = passable.ravel()
+        changed = np.flatnonzero(passable != self.mask)
+        if len(changed) == 0:
+            return
+        self.mask[changed] = passable[changed]
+        changed = changed.tolist()
+        for index in changed:
+            self.passable[index] = not self.passable[index]
+        for index in changed:
+            self._update_vertex(index)
+            for n in self._neighbours(index):
+                self._update_vertex(n)
+        self.compute_shortest_path()
+
+    def extract_path(self):
+        """Greedily descend g from the start to a goal; [] if unreachable."""
+        index = self.start[0] * self.width + self.start[1]
+        if self.rhs[index] == math.inf and index not in self.goals:
+            return []
+
+        path = [divmod(index, self.width)]
+        for _ in range(self.height * self.width):
+            if index in self.goals:
+                return path
+            best = min(
+                (n for n in self._neighbours(index) if self.passable[n]),
+                key=lambda n: self.g[n],
+                default=None
+            )
+            if best is None or self.g[best] == math.inf:
+                return []
+            index = best
+            path.append(divmod(index, self.width))
+        return []
+
+
+# Markers in space_time_search's per-state move codes
+_UNSEEN = 255
+_ROOT = 254
+
+
+def _is_covered(phases, phase, x, y):
+    """Read one cell from a bit-packed (phase, row, packed col) coverage cube."""
+    return (phases[phase, x, y >> 3] >> (7 - (y & 7))) & 1
+
+
+def space_time_search(street, phases, start, goals):
+    """Find the fastest route when camera coverage repeats with a fixed period.
+
+    phases is a bit-packed cube where phase t holds the cells watched t steps
+    from now (modulo the period). The search runs over (x, y, t mod period)
+    and may wait in place, so it can slip past cameras while they rest. A cell
+    occupied during step t must be unwatched at both t and t + 1, since the
+    agent stays there for a whole step; this holds for the start cell too.
+    Returns one cell per step, repeated while waiting, or [] if no exit can be
+    reached unseen.
+    """
+    height, width = street.shape
+    period = phases.shape[0]
+    goals = {(gx, gy) for gx, gy in goals}
+    if start is None or not goals:
+        return []
+    sx, sy = start
+    if _is_covered(phases, 0, sx, sy) or _is_covered(phases, 1 % period, sx, sy):
+        return []
+
+    moves = DIRECTIONS + [(0, 0)]  # Moving or waiting
+    layer = height * width
+    open_cells = street.ravel().tolist()
+    # One byte per state: the move that reached it, _UNSEEN or _ROOT. The
+    # previous state follows from the move, so no full-size index array is kept
+    came_by = bytearray([_UNSEEN]) * (period * layer)
+
+    start_state = sx * width + sy
+    came_by[start_state] = _ROOT
+    queue = deque([start_state])
+
+    while queue:
+        state = queue.popleft()
+        t, index = divmod(state, layer)
+        x, y = divmod(index, width)
+        if (x, y) in goals:
+            path = [(x, y)]
+            while came_by[state] != _ROOT:
+                dx, dy = moves[came_by[state]]
+                x, y = x - dx, y - dy
+                t = (t - 1) % period
+                state = t * layer + x * width + y
+                path.append((x, y))
+            path.reverse()
+            return path
+
+        nt = (t + 1) % period
+        after = (t + 2) % period
+        for move, (dx, dy) in enumerate(moves):
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < height and 0 <= ny < width):
+                continue
+            n_index = nx * width + ny
+            n_state = nt * layer + n_index
+            if came_by[n_state] != _UNSEEN or not open_cells[n_index]:
+                continue
+            if _is_covered(phases, nt, nx, ny) or _is_covered(phases, after, nx, ny):
+                continue
+            came_by[n_state] = move
+            queue.append(n_state)
+
+    return []
+
+
+def min_exposure_path(street, coverage, start, goals, exposure_weight=10):
+    """Find the least-exposed route to an exit with Dijkstra.
+
+    Entering a cell costs 1 plus exposure_weight for every camera watching it,
+    so a fully hidden route is preferred whenever one exists and otherwise the
+    route spends the fewest steps in view. Returns [] only if no exit can be
+    reached over street cells at all.
+    """
+    height, width = street.shape
+    goal_indices = {gx * width + gy for gx, gy in goals
+                    if 0 <= gx < height and 0 <= gy < width}
+    if not goal_indices or start is None:
+        return []
+
+    sx, sy = start
+    open_cells = street.ravel().tolist()
+    step_costs = (1 + exposure_weight * coverage.ravel()).tolist()
+    parent = np.full(height * width, -1, dtype=np.int64)
+    cost = [math.inf] * (height * width)
+
+    start_index = sx * width + sy
+    cost[start_index] = 0
+    frontier = [(0, start_index)]
+
+    while frontier:
+        current, index = heapq.heappop(frontier)
+        if current > cost[index]:
+            continue
+        if index in goal_indices:
+            return _reconstruct_path(parent, index, width)
+
+        x, y = divmod(index, width)
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < height and 0 <= ny < width):
+                continue
+            n_index = nx * width + ny
+            if not open_cells[n_index]:
+                continue
+            new_cost = current + step_costs[n_index]
+            if new_cost < cost[n_index]:
+                cost[n_index] = new_cost
+                parent[n_index] = index
+                heapq.heappush(frontier, (new_cost, n_index))
+
+    return []
+
+
+def path_exposure(coverage, path):
+    """Total number of camera-watched steps along a path, excluding its start."""
+    return int(sum(coverage[x, y] for x, y in path[1:]))
@@ -3,6 +3,8 @@ Manages the user interface elements and rendering.
 """
 import pygame
 import os
+from src.utils.text_cache import render_text
+from src.utils.asset_cache import get_asset_cache
 
 class UIManager:
     def __init__(self, screen, city_map, game_state):
@@ -41,10 +43,12 @@ class UIManager:
         )
     
     def _create_circle_surface(self, size, color):
-        """Create a circular surface with the given size and color."""
-        surface = pygame.Surface((size, size), pygame.SRCALPHA)
-        pygame.draw.circle(surface, color, (size // 2, size // 2), size // 2)
-        return surface
+        """Create a circular surface with the given size and color, shared through the asset cache."""
+        def draw():
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color, (size // 2, size // 2), size // 2)
+            return surface
+        return get_asset_cache().get(("circle", size, tuple(color)), draw)
     
     def handle_event(self, event):
         """Handle UI events."""
@@ -121,7 +125,7 @@ class UIManager:
                     self.screen.blit(self.img_city, (x - 10, y - 10))
                 
                 # Draw location name
-                text = self.font_small.render(location, True, (255, 255, 255))
+                text = render_text(self.font_small, location, True, (255, 255, 255))
                 self.screen.blit(text, (x - text.get_width() // 2, y + 15))
             except Exception as e:
                 print(f"Lỗi khi vẽ địa điểm {location}: {e}")
@@ -177,7 +181,7 @@ class UIManager:
         pygame.draw.rect(self.screen, (50, 50, 50), self.control_panel_rect)
         
         # Draw panel title
-        title = self.font_medium.render("Control Panel", True, (255, 255, 255))
+        title = render_text(self.font_medium, "Control Panel", True, (255, 255, 255))
         self.screen.blit(
             title, 
             (self.control_panel_rect.x + (self.control_panel_rect.width - title.get_width()) // 2, 
@@ -196,8 +200,8 @@ class UIManager:
             (0, 150, 0) if self.camera_placement_mode else (0, 100, 0), 
             camera_button_rect
         )
-        camera_text = self.font_small.render(
-            "Place Camera", True, (255, 255, 255)
+        camera_text = render_text(
+            self.font_small, "Place Camera", True, (255, 255, 255)
         )
         self.screen.blit(
             camera_text,
@@ -207,25 +211,25 @@ class UIManager:
         
         # Draw score information
         score_y = self.control_panel_rect.y + 150
-        player_score_text = self.font_small.render(
-            f"Player Score: {self.game_state.player_score}", True, (255, 255, 255)
+        player_score_text = render_text(
+            self.font_small, f"Player Score: {self.game_state.player_score}", True, (255, 255, 255)
         )
         self.screen.blit(player_score_text, (self.control_panel_rect.x + 20, score_y))
         
-        ai_score_text = self.font_small.render(
-            f"AI Score: {self.game_state.ai_score}", True, (255, 255, 255)
+        ai_score_text = render_text(
+            self.font_small, f"AI Score: {self.game_state.ai_score}", True, (255, 255, 255)
         )
         self.screen.blit(ai_score_text, (self.control_panel_rect.x + 20, score_y + 30))
         
         # Draw time
-        time_text = self.font_small.render(
-            f"Time: {int(self.game_state.game_time)}s", True, (255, 255, 255)
+        time_text = render_text(
+            self.font_small, f"Time: {int(self.game_state.game_time)}s", True, (255, 255, 255)
         )
         self.screen.blit(time_text, (self.control_panel_rect.x + 20, score_y + 60))
         
         # Draw help hint
-        help_text = self.font_small.render(
-            "Press H for Help", True, (200, 200, 200)
+        help_text = render_text(
+            self.font_small, "Press H for Help", True, (200, 200, 200)
         )
         self.screen.blit(
             help_text, 
@@ -236,15 +240,15 @@ class UIManager:
         """Render game information."""
         # Draw hover location info
         if self.hover_location and self.hover_location not in ["connections", "exit_points"]:
-            info_text = self.font_small.render(
-                f"Location: {self.hover_location}", True, (255, 255, 255)
+            info_text = render_text(
+                self.font_small, f"Location: {self.hover_location}", True, (255, 255, 255)
             )
             self.screen.blit(info_text, (10, 10))
             
             # If it's an exit point, indicate this
             if "exit_points" in self.city_map and self.hover_location in self.city_map["exit_points"]:
-                exit_text = self.font_small.render(
-                    "EXIT POINT", True, (255, 255, 0)
+                exit_text = render_text(
+                    self.font_small, "EXIT POINT", True, (255, 255, 0)
                 )
                 self.screen.blit(exit_text, (10, 40))
     
@@ -256,7 +260,7 @@ class UIManager:
         self.screen.blit(overlay, (0, 0))
         
         # Draw help text
-        help_title = self.font_large.render("Help", True, (255, 255, 255))
+        help_title = render_text(self.font_large, "Help", True, (255, 255, 255))
         self.screen.blit(
             help_title, 
             ((self.screen.get_width() - help_title.get_width()) // 2, 50)
@@ -275,7 +279,7 @@ class UIManager:
         
         y = 150
         for text in help_texts:
-            rendered = self.font_medium.render(text, True, (255, 255, 255))
+            rendered = render_text(self.font_medium, text, True, (255, 255, 255))
             self.screen.blit(
                 rendered,
                 ((self.screen.get_width() - rendered.get_width()) // 2, y)
@@ -290,7 +294,7 @@ class UIManager:
         self.screen.blit(overlay, (0, 0))
         
         # Draw game over text
-        game_over_text = self.font_large.render("Game Over", True, (255, 255, 255))
+        game_over_text = render_text(self.font_large, "Game Over", True, (255, 255, 255))
         self.screen.blit(
             game_over_text,
             ((self.screen.get_width() - game_over_text.get_width()) // 2, 150)
@@ -304,15 +308,15 @@ class UIManager:
             result_text = "The AI escaped! You lose!"
             color = (255, 0, 0)  # Red for defeat
             
-        result_rendered = self.font_large.render(result_text, True, color)
+        result_rendered = render_text(self.font_large, result_text, True, color)
         self.screen.blit(
             result_rendered,
             ((self.screen.get_width() - result_rendered.get_width()) // 2, 250)
         )
         
         # Draw scores
-        score_text = self.font_medium.render(
-            f"Player Score: {self.game_state.player_score}   AI Score: {self.game_state.ai_score}",
+        score_text = render_text(
+            self.font_medium, f"Player Score: {self.game_state.player_score}   AI Score: {self.game_state.ai_score}",
             True, (255, 255, 255)
         )
         self.screen.blit(
@@ -321,8 +325,8 @@ class UIManager:
         )
         
         # Draw continue text
-        continue_text = self.font_medium.render(
-            "Press any key to play again", True, (200, 200, 200)
+        continue_text = render_text(
+            self.font_medium, "Press any key to play again", True, (200, 200, 200)
         )
         self.screen.blit(
             continue_text,
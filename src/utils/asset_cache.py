@@ -0,0 +1,113 @@
+"""Process-wide cache of decoded and scaled sprites and UI images."""
+import json
+import os
+import pygame
+from src.utils.gif_loader import load_gif_frames
+
+class AssetCache:
+    def __init__(self, atlas_dir=os.path.join("assets", "sprites", "atlas")):
+        """Initialize an empty cache that keeps pre-scaled frame atlases in atlas_dir."""
+        self.atlas_dir = atlas_dir
+        self.assets = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """Return the asset stored under key, creating it with factory() on first use."""
+        asset = self.assets.get(key)
+        if asset is not None:
+            self.hits += 1
+            return asset
+
+        self.misses += 1
+        asset = factory()
+        self.assets[key] = asset
+        return asset
+
+    def load_sprite_frames(self, path, size):
+        """Frames of a GIF scaled to size, with their durations: (frames, durations).
+
+        Looked up in memory first, then in the pre-scaled atlas on disk; only
+        if neither has them is the GIF decoded with PIL, and the atlas written
+        for the next start. The frames are shared, so callers must not draw
+        on them. Returns ([], []) if the GIF cannot be read.
+        """
+        key = ("gif", os.path.abspath(path), tuple(size))
+        cached = self.assets.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        if not os.path.exists(path):
+            return [], []
+        source = self._source_stamp(path)
+        frames = self._load_atlas(path, size, source)
+        if frames is None:
+            frames = self._decode(path, size)
+            if not frames[0]:
+                return [], []
+            self._save_atlas(path, size, source, *frames)
+        self.assets[key] = frames
+        return frames
+
+    @staticmethod
+    def _source_stamp(path):
+        """Modification time and size of the source file, to spot stale atlases."""
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _atlas_paths(self, path, size):
+        name = os.path.splitext(os.path.basename(path))[0]
+        base = os.path.join(self.atlas_dir, f"{name}_{size[0]}x{size[1]}")
+        return base + ".png", base + ".json"
+
+    @staticmethod
+    def _decode(path, size):
+        frames, durations = load_gif_frames(gif_path=path)
+        return [pygame.transform.scale(frame, size) for frame in frames], durations
+
+    def _load_atlas(self, path, size, source):
+        """Cut the frames out of the atlas image, or None if it is missing or stale."""
+        image_path, meta_path = self._atlas_paths(path, size)
+        if not (os.path.exists(image_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta["source"] != source or meta["size"] != list(size):
+                return None
+            atlas = pygame.image.load(image_path)
+            width, height = size
+            frames = [atlas.subsurface((i * width, 0, width, height)) for i in range(len(meta["durations"]))]
+            return frames, meta["durations"]
+        except Exception as e:
+            print(f"Lỗi khi tải atlas sprite: {e}")
+            return None
+
+    def _save_atlas(self, path, size, source, frames, durations):
+        """Write the scaled frames side by side into one PNG plus a JSON description."""
+        image_path, meta_path = self._atlas_paths(path, size)
+        try:
+            os.makedirs(self.atlas_dir, exist_ok=True)
+            width, height = size
+            atlas = pygame.Surface((width * len(frames), height), pygame.SRCALPHA)
+            for i, frame in enumerate(frames):
+                # Copy pixels exactly; an alpha blend onto the empty atlas would darken soft edges
+                atlas.blit(frame, (i * width, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            pygame.image.save(atlas, image_path)
+            with open(meta_path, 'w') as f:
+                json.dump({"source": source, "size": list(size), "durations": durations}, f)
+        except Exception as e:
+            print(f"Lỗi khi lưu atlas sprite: {e}")
+
+    def clear(self):
+        """Forget every asset held in memory (atlases on disk are kept)."""
+        self.assets.clear()
+
+# Cache shared by every agent and the UI manager
+_asset_cache = AssetCache()
+
+def get_asset_cache():
+    """Return the shared asset cache."""
+    return _asset_cache
@@ -0,0 +1,145 @@
+"""Per-phase timing of game frames, with rolling percentiles and Chrome trace export."""
+import json
+import os
+import time
+from collections import deque
+import numpy as np
+
+class _Section:
+    """Context manager timing one named section of the current frame."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._record(self.name, self.start, time.perf_counter())
+        return False
+
+class _NoSection:
+    """Stand-in used while profiling is off, so timed code pays almost nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SECTION = _NoSection()
+
+class FrameProfiler:
+    def __init__(self, window=300, max_events=1000000):
+        """Keep the last window frames of timings and at most max_events trace events."""
+        self.enabled = False
+        self.tracing = False
+        self.window = window
+        self.max_events = max_events
+        self.samples = {}  # section name -> deque of milliseconds per frame
+        self.events = []  # Chrome trace events, recorded while tracing
+        self.frames = 0
+        self._current = {}  # section name -> milliseconds so far this frame
+        self._frame_start = None
+        self._origin = time.perf_counter()
+
+    def start(self, tracing=False):
+        """Turn profiling on, optionally recording every section for a trace file."""
+        self.enabled = True
+        self.tracing = self.tracing or tracing
+
+    def section(self, name):
+        """Time the code in a with block under name."""
+        if not self.enabled:
+            return _NO_SECTION
+        return _Section(self, name)
+
+    def _record(self, name, start, end):
+        duration = (end - start) * 1000.0
+        self._current[name] = self._current.get(name, 0.0) + duration
+        if self.tracing and len(self.events) < self.max_events:
+            self.events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1000.0,
+                "pid": os.getpid(),
+                "tid": 0
+            })
+
+    def begin_frame(self):
+        """Mark the start of a frame."""
+        if self.enabled:
+            self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Close the frame and add its section totals to the rolling window."""
+        if not self.enabled or self._frame_start is None:
+            return
+        self._record("frame", self._frame_start, time.perf_counter())
+        self._frame_start = None
+        self.frames += 1
+
+        current = self._current
+        for name in current:
+            if name not in self.samples:
+                # Frames before the section first ran spent no time in it
+                self.samples[name] = deque([0.0] * min(self.frames - 1, self.window), maxlen=self.window)
+        for name, samples in self.samples.items():
+            samples.append(current.get(name, 0.0))
+        self._current = {}
+
+    def percentiles(self, name, qs=(50, 95, 99)):
+        """Percentiles in milliseconds of a section's per-frame time over the window."""
+        samples = self.samples.get(name)
+        if not samples:
+            return [0.0] * len(qs)
+        return [float(v) for v in np.percentile(np.fromiter(samples, dtype=float), qs)]
+
+    def summary(self, qs=(50, 95, 99)):
+        """List of (section, percentiles) with the whole frame first, then by p95."""
+        rows = [(name, self.percentiles(name, qs)) for name in self.samples]
+        rows.sort(key=lambda row: (row[0] != "frame", -row[1][min(1, len(qs) - 1)]))
+        return rows
+
+    def format_summary(self):
+        """Summary as text lines for the debug overlay."""
+        lines = ["Frame ms   p50   p95   p99"]
+        for name, (p50, p95, p99) in self.summary():
+            lines.append(f"{name:<16}{p50:6.2f}{p95:6.2f}{p99:6.2f}")
+        return lines
+
+    def write_trace(self, path):
+        """Write the recorded sections as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        return len(self.events)
+
+    def reset(self):
+        """Forget all samples and trace events."""
+        self.samples = {}
+        self.events = []
+        self.frames = 0
+        self._current = {}
+        self._frame_start = None
+
+# Profiler shared by the engine, map and agent
+_frame_profiler = FrameProfiler()
+
+def profile(name):
+    """Time a section of the current frame with the shared profiler."""
+    return _frame_profiler.section(name)
+
+def get_frame_profiler():
+    """Return the shared profiler."""
+    return _frame_profiler
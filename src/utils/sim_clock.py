@@ -0,0 +1,24 @@
+"""Clocks that drive camera cycles and agent movement."""
+import time
+
+class RealTimeClock:
+    """Wall-clock time, used when the game runs in a window."""
+
+    def now(self):
+        """Current time in seconds."""
+        return time.time()
+
+class SimulationClock:
+    """Simulated time that only moves when advanced, for fixed-step and headless runs."""
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        """Current simulated time in seconds."""
+        return self.time
+
+    def advance(self, dt):
+        """Move simulated time forward by dt seconds."""
+        self.time += dt
+        return self.time
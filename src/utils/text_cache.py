@@ -0,0 +1,42 @@
+"""Cache of rendered text surfaces shared by the UI."""
+from collections import OrderedDict
+
+class TextCache:
+    def __init__(self, max_size=512):
+        """Initialize an LRU cache holding up to max_size rendered surfaces."""
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """Return font.render(text, antialias, color), rasterizing each key only once."""
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            # Drop the least recently used surface
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        """Forget every cached surface."""
+        self.surfaces.clear()
+
+# Cache shared by the game engine, buttons and UI manager
+_text_cache = TextCache()
+
+def render_text(font, text, antialias, color):
+    """Render text through the shared cache; same arguments as Font.render."""
+    return _text_cache.render(font, text, antialias, color)
+
+def get_text_cache():
+    """Return the shared text cache."""
+    return _text_cache
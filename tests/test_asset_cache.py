@@ -0,0 +1,46 @@
+"""
+Tests for the shared sprite and image cache.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pygame
+from PIL import Image
+from src.utils.asset_cache import AssetCache
+
+
+class TestAssetCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.gif_path = os.path.join(self.directory.name, "sprite.gif")
+        frames = [Image.new("RGBA", (8, 4), color) for color in [(255, 0, 0, 255), (0, 0, 255, 255)]]
+        frames[0].save(self.gif_path, save_all=True, append_images=frames[1:], duration=[80, 120], loop=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_frames_are_shared_and_persisted(self):
+        """Test that frames are decoded once per process and later read from the atlas."""
+        atlas_dir = os.path.join(self.directory.name, "atlas")
+        cache = AssetCache(atlas_dir)
+        frames, durations = cache.load_sprite_frames(self.gif_path, (16, 8))
+        self.assertEqual([frame.get_size() for frame in frames], [(16, 8), (16, 8)])
+        self.assertEqual(durations, [80, 120])
+        self.assertIs(cache.load_sprite_frames(self.gif_path, (16, 8))[0], frames)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # A new process finds the pre-scaled atlas and never decodes the GIF
+        with patch("src.utils.asset_cache.load_gif_frames") as decode:
+            reloaded, reloaded_durations = AssetCache(atlas_dir).load_sprite_frames(self.gif_path, (16, 8))
+        decode.assert_not_called()
+        self.assertEqual(reloaded_durations, durations)
+        for frame, again in zip(frames, reloaded):
+            self.assertEqual(pygame.image.tostring(frame, "RGBA"), pygame.image.tostring(again, "RGBA"))
+
+        # Another size is a separate entry
+        self.assertEqual(cache.load_sprite_frames(self.gif_path, (4, 2))[0][0].get_size(), (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the street connectivity index.
+"""
+import unittest
+import numpy as np
+from src.game.connectivity import ConnectivityIndex, label_components
+from src.game.pathfinding import astar
+from src.game.map import GameMap
+
+
+class TestConnectivity(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.grids = [(rng.random((20, 20)) < 0.45).astype(np.uint8) for _ in range(10)]
+
+    def test_labels_match_search(self):
+        """Test that two cells share a label exactly when a path joins them."""
+        for grid in self.grids:
+            labels, count = label_components(grid == 0)
+            self.assertEqual(set(np.unique(labels)) - {-1}, set(range(count)))
+            streets = [tuple(cell) for cell in np.argwhere(grid == 0)[::17]]
+            for a in streets[:6]:
+                for b in streets:
+                    reachable = len(astar(grid == 0, a, [b])) > 0
+                    self.assertEqual(labels[a] == labels[b], reachable)
+
+    def test_open_cell_matches_rebuild(self):
+        """Test that opening cells merges components like a full relabelling."""
+        rng = np.random.default_rng(4)
+        for grid in self.grids:
+            index = ConnectivityIndex(grid)
+            for x, y in rng.integers(0, 20, size=(30, 2)):
+                grid[x, y] = 0
+                index.open_cell(x, y)
+
+            labels, _ = label_components(grid == 0)
+            cells = [tuple(cell) for cell in np.argwhere(grid == 0)]
+            for a, b in zip(cells, cells[1:] + cells[:1]):
+                self.assertEqual(index.connected(a, b), labels[a] == labels[b])
+
+
+    def test_grid_without_streets(self):
+        """Test that a grid of only barriers has no components and no route out."""
+        walls = np.ones((20, 20), dtype=np.uint8)
+        labels, count = label_components(walls == 0)
+        self.assertEqual(count, 0)
+        self.assertTrue((labels == -1).all())
+
+        index = ConnectivityIndex(walls)
+        self.assertFalse(index.connected((1, 1), (18, 18)))
+        index.open_cell(5, 5)
+        self.assertTrue(index.connected((5, 5), (5, 5)))
+
+        game_map = GameMap.from_grid(walls, {"map_size": 20, "cell_size": 10})
+        self.assertFalse(game_map.has_valid_path())
+
+
+if __name__ == "__main__":
+    unittest.main()
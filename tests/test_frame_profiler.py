@@ -0,0 +1,47 @@
+"""
+Tests for the frame profiler.
+"""
+import json
+import os
+import tempfile
+import time
+import unittest
+from src.utils.frame_profiler import FrameProfiler
+
+
+class TestFrameProfiler(unittest.TestCase):
+    def test_sections_percentiles_and_trace(self):
+        """Test that sections are summed per frame and exported as trace events."""
+        profiler = FrameProfiler(window=10)
+        with profiler.section("idle"):
+            pass
+        self.assertEqual(profiler.samples, {})  # Off until started
+
+        profiler.start(tracing=True)
+        for frame in range(4):
+            profiler.begin_frame()
+            with profiler.section("update"):
+                time.sleep(0.002)
+            if frame == 3:
+                with profiler.section("path_planning"):
+                    time.sleep(0.002)
+            profiler.end_frame()
+
+        self.assertEqual(profiler.frames, 4)
+        self.assertEqual(len(profiler.samples["path_planning"]), 4)
+        p50, p95, p99 = profiler.percentiles("update")
+        self.assertGreaterEqual(p50, 2.0)
+        self.assertEqual(profiler.percentiles("path_planning", (50,)), [0.0])
+        self.assertEqual(profiler.summary()[0][0], "frame")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.assertEqual(profiler.write_trace(path), 9)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual({e["name"] for e in events}, {"frame", "update", "path_planning"})
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] > 0 for e in events))
+
+
+if __name__ == "__main__":
+    unittest.main()
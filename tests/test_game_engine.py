@@ -0,0 +1,210 @@
+"""
+Tests for the game engine's rendering modes, headless simulation and background planning.
+"""
+import os
+import tempfile
+import unittest
+import random
+from unittest.mock import patch
+import pygame
+from src.game.game_engine import GameEngine
+from src.game.map import GameMap
+from src.game.ai_agent import AIAgent
+from src.utils.asset_cache import get_asset_cache
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+class TestDirtyRendering(unittest.TestCase):
+    def setUp(self):
+        random.seed(21)
+        pygame.init()
+        # Keep the sprite atlas written for the agent out of the repository
+        self.atlas_dir = tempfile.TemporaryDirectory()
+        self.atlas_patch = patch.object(get_asset_cache(), "atlas_dir", self.atlas_dir.name)
+        self.atlas_patch.start()
+        self.engine = GameEngine({
+            "map_size": 20,
+            "cell_size": 10,
+            "render_mode": "dirty",
+            "map_pool_size": 0,
+            "colors": {
+                "background": (255, 255, 255),
+                "street": (150, 150, 150),
+                "ai": (0, 200, 0)
+            }
+        })
+
+    def tearDown(self):
+        if self.engine.map_pool is not None:
+            self.engine.map_pool.shutdown()
+        self.atlas_patch.stop()
+        self.atlas_dir.cleanup()
+
+    def test_only_changed_areas_are_redrawn(self):
+        """Test that the first frame is full and later frames report changed areas."""
+        engine = self.engine
+        self.assertEqual(engine._collect_dirty_rects(), [engine.screen.get_rect()])
+
+        # Nothing but the animated agent changes while idle
+        agent_area = engine.ai_agent._sprite_rect().clip(engine.screen.get_rect())
+        self.assertEqual(engine._collect_dirty_rects(), [agent_area])
+
+        wall = next((x, y) for x in range(2, 18) for y in range(2, 18) if engine.game_map.grid[x][y] == 1)
+        engine.game_map.add_camera(wall)
+        camera = engine.game_map.cameras[-1]
+        rects = engine._collect_dirty_rects()
+        self.assertIn(camera.get_screen_rect().clip(engine.screen.get_rect()), rects)
+
+        engine.selected_camera = 0
+        rects = engine._collect_dirty_rects()
+        self.assertTrue(any(rect.x >= engine.map_size * engine.cell_size for rect in rects))
+
+        # Dirty rendering matches a full redraw
+        engine._full_redraw = True
+        engine.render()
+        camera.rotate()
+        engine.show_path = False
+        engine.render()
+        dirty = engine.screen.copy()
+        engine.draw()
+        self.assertEqual(pygame.image.tostring(dirty, "RGB"), pygame.image.tostring(engine.screen, "RGB"))
+
+
+class TestHeadlessSimulation(unittest.TestCase):
+    def _run(self):
+        random.seed(5)
+        engine = GameEngine({"map_size": 20, "cell_size": 10, "map_seed": 3, "map_cache": False}, headless=True)
+        walls = [(x, y) for x in range(2, 18) for y in range(2, 18) if engine.game_map.grid[x][y] == 1]
+        self.assertEqual(engine.place_cameras([(x, y, 90) for x, y in walls[:8]]), 8)
+        return engine, engine.run_headless(max_ticks=20000, dt=0.05)
+
+    def test_runs_to_a_result_on_simulated_time(self):
+        """Test that a headless run finishes and repeats exactly with the same seeds."""
+        engine, summary = self._run()
+        self.assertIsNone(engine.screen)
+        self.assertIn(summary["result"], ("captured", "escaped"))
+        self.assertAlmostEqual(engine.sim_clock.now(), summary["sim_time"])
+
+        _, again = self._run()
+        self.assertEqual(summary, again)
+
+    def test_timed_path_is_never_seen(self):
+        """Test that an agent following a timed plan slips past cameras that keep their schedule."""
+        timed_runs = 0
+        for seed in range(12):
+            random.seed(seed)
+            engine = GameEngine({"map_size": 20, "cell_size": 10, "map_seed": seed, "map_cache": False,
+                                 "path_mode": "timed"}, headless=True)
+            walls = [(x, y) for x in range(1, 19) for y in range(1, 19) if engine.game_map.grid[x][y] == 1]
+            random.shuffle(walls)
+            engine.place_cameras([(x, y, random.choice([0, 90, 180, 270])) for x, y in walls[:10]])
+            summary = engine.run_headless(max_ticks=20000, dt=1 / 60)
+            if engine.ai_agent._plan_mode == "timed" and engine.ai_agent.path_hidden:
+                timed_runs += 1
+                self.assertEqual(summary["result"], "escaped", f"seed {seed}")
+        self.assertGreater(timed_runs, 6)
+
+    def test_cameras_cycle_with_simulated_time(self):
+        """Test that cameras switch between scanning and resting as the clock advances."""
+        engine = GameEngine({"map_size": 20, "cell_size": 10, "map_cache": False}, headless=True)
+        wall = next((x, y) for x in range(2, 18) for y in range(2, 18) if engine.game_map.grid[x][y] == 1)
+        engine.place_cameras([wall])
+        camera = engine.game_map.cameras[0]
+
+        engine.sim_clock.advance(camera.scan_time - 0.5)
+        engine.update(0.0)
+        self.assertTrue(camera.active)
+        engine.sim_clock.advance(1.0)
+        engine.update(0.0)
+        self.assertFalse(camera.active)
+
+
+class TestBackgroundPlanning(unittest.TestCase):
+    def test_plan_arrives_and_stale_plans_are_replaced(self):
+        """Test that a background plan is dropped when a camera is placed, then picked up."""
+        config = {"map_size": 30, "cell_size": 10, "map_seed": 11, "map_cache": False, "hpa_min_map_size": 20}
+        game_map = GameMap(config)
+        agent = AIAgent(game_map, config, load_sprite=False)
+        agent.start_movement(background=True)
+        self.assertTrue(agent.planning)
+        self.assertFalse(agent.is_moving)
+        first = agent._plan_future
+
+        wall = next((x, y) for x in range(20, 28) for y in range(2, 10) if game_map.grid[x][y] == 1)
+        game_map.add_camera(wall)
+        agent.update(0.0)
+        self.assertIsNot(agent._plan_future, first)
+
+        agent._plan_future.result(timeout=30)
+        agent.update(0.0)
+        self.assertFalse(agent.planning)
+        self.assertTrue(agent.is_moving)
+        self.assertEqual(agent.path[0], game_map.start_pos)
+        self.assertIsNotNone(game_map.get_cluster_graph(build=False))
+
+        # The same path as planning inline on an identical map
+        inline_map = GameMap(config)
+        inline_map.add_camera(wall)
+        inline = AIAgent(inline_map, config, load_sprite=False)
+        inline.start_movement()
+        self.assertEqual(agent.path, inline.path)
+
+        # Later searches get a private copy of the map's graph
+        agent.reset()
+        agent.start_movement(background=True)
+        graph = game_map.get_cluster_graph(build=False)
+        self.assertIsNot(agent._plan_request.cluster_graph, graph)
+        self.assertIsNot(agent._plan_request.cluster_graph.inter, graph.inter)
+        agent._plan_future.result(timeout=30)
+        agent.update(0.0)
+        self.assertEqual(agent.path, inline.path)
+
+    def test_late_timed_plan_keeps_to_the_camera_cycle(self):
+        """Test that a timed plan picked up after planning delay is still never seen."""
+        timed_runs = 0
+        for seed in range(12):
+            random.seed(seed)
+            engine = GameEngine({"map_size": 20, "cell_size": 10, "map_seed": seed, "map_cache": False,
+                                 "path_mode": "timed"}, headless=True)
+            walls = [(x, y) for x in range(1, 19) for y in range(1, 19) if engine.game_map.grid[x][y] == 1]
+            random.shuffle(walls)
+            engine.place_cameras([(x, y, random.choice([0, 90, 180, 270])) for x, y in walls[:10]])
+
+            engine.state = "planning"
+            engine.ai_agent.start_movement(background=True)
+            engine.ai_agent._plan_future.result(timeout=30)
+            # The cameras keep cycling while the worker is busy
+            dt = 1 / 60
+            for _ in range(24 + seed * 5):
+                engine.sim_clock.advance(dt)
+                for camera in engine.game_map.cameras:
+                    camera.update()
+            for _ in range(20000):
+                if engine.state not in ("planning", "simulation"):
+                    break
+                engine.sim_clock.advance(dt)
+                engine.update(dt)
+                if engine.ai_agent._plan_future is not None:
+                    engine.ai_agent._plan_future.result(timeout=30)
+
+            if engine.ai_agent._plan_mode == "timed" and engine.ai_agent.path_hidden:
+                timed_runs += 1
+                self.assertEqual(engine.simulation_result, "escaped", f"seed {seed}")
+        self.assertGreater(timed_runs, 6)
+
+    def test_worker_sets_up_the_incremental_planner(self):
+        """Test that a background A* plan arrives with its D* Lite planner ready."""
+        config = {"map_size": 30, "cell_size": 10, "map_seed": 11, "map_cache": False}
+        game_map = GameMap(config)
+        agent = AIAgent(game_map, config, load_sprite=False)
+        agent.start_movement(background=True)
+        agent._plan_future.result(timeout=30)
+        agent.update(0.0)
+        self.assertTrue(agent.is_moving)
+        self.assertIsNotNone(agent.planner)
+        self.assertEqual(agent.planner.extract_path(), agent.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for the junction graph contracted from the maze grid.
+"""
+import unittest
+import random
+from src.game.map import GameMap
+from src.game.ai_agent import AIAgent
+from src.game.junction_graph import find_junctions, worth_contracting
+from src.game.pathfinding import astar
+
+
+def scan_junctions(grid):
+    """Junctions found by checking every cell one at a time."""
+    size_x, size_y = grid.shape
+    junctions = []
+    for x in range(size_x):
+        for y in range(size_y):
+            if grid[x][y] != 0:
+                continue
+            open_neighbors = 0
+            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size_x and 0 <= ny < size_y and grid[nx][ny] == 0:
+                    open_neighbors += 1
+            if open_neighbors >= 3:
+                junctions.append((x, y))
+    return junctions
+
+
+class TestJunctions(unittest.TestCase):
+    def setUp(self):
+        random.seed(99)
+        self.game_map = GameMap({"map_size": 31, "cell_size": 25})
+
+    def test_junctions_match_cell_scan(self):
+        """Test that the vectorised search finds the same cells as a scan."""
+        found = [tuple(cell) for cell in find_junctions(self.game_map.grid)]
+        self.assertEqual(found, scan_junctions(self.game_map.grid))
+        self.assertEqual([tuple(cell) for cell in self.game_map.junction_positions], found)
+
+    def test_set_cells_refreshes_junctions(self):
+        """Test that editing the grid keeps the junction list up to date."""
+        rng = random.Random(5)
+        for _ in range(10):
+            cells = [(rng.randint(1, 29), rng.randint(1, 29)) for _ in range(3)]
+            cells = [cell for cell in cells if cell != (1, 1) and cell not in self.game_map.end_positions]
+            self.game_map.set_cells(cells, rng.choice([0, 1]))
+            self.assertEqual([tuple(cell) for cell in self.game_map.junction_positions],
+                             scan_junctions(self.game_map.grid))
+
+
+class TestJunctionGraph(unittest.TestCase):
+    def setUp(self):
+        random.seed(99)
+        self.game_map = GameMap({"map_size": 31, "cell_size": 25})
+        self.graph = self.game_map.get_junction_graph()
+
+    def test_corridors_cover_streets(self):
+        """Test that every reachable street cell is a node or on one corridor."""
+        street = self.game_map.grid == 0
+        for cell, key in self.graph.cell_edge.items():
+            self.assertTrue(street[cell])
+            self.assertIn(cell, self.graph.edges[key].cells)
+        for corridor in self.graph.edges.values():
+            path = [corridor.start] + corridor.cells + [corridor.end]
+            for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                self.assertEqual(abs(x1 - x2) + abs(y1 - y2), 1)
+        self.assertLess(len(self.graph.nodes), int(street.sum()))
+
+    def test_shortest_path_matches_grid_search(self):
+        """Test that searching the graph gives grid-optimal paths, also around watched cells."""
+        street = self.game_map.grid == 0
+        goals = self.game_map.end_positions
+        rng = random.Random(8)
+        for watched in (0, 40):
+            passable = street.copy()
+            for _ in range(watched):
+                passable[rng.randint(1, 29), rng.randint(1, 29)] = False
+            for goal in goals:
+                passable[goal] = True
+            for start in [(1, 1)] + list(self.graph.cell_edge)[::40]:
+                path = self.graph.shortest_path(start, goals, passable)
+                self.assertEqual(len(path), len(astar(passable, start, goals)))
+                if path:
+                    self.assertEqual(path[0], start)
+                    self.assertIn(path[-1], goals)
+                    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                        self.assertEqual(abs(x1 - x2) + abs(y1 - y2), 1)
+                        self.assertTrue(passable[x2, y2])
+
+    def test_incremental_update_matches_rebuild(self):
+        """Test that updating changed cells gives the same graph as a rebuild."""
+        rng = random.Random(5)
+        for _ in range(10):
+            cells = [(rng.randint(1, 29), rng.randint(1, 29)) for _ in range(3)]
+            cells = [cell for cell in cells if cell != (1, 1) and cell not in self.game_map.end_positions]
+            value = rng.choice([0, 1])
+            self.game_map.set_cells(cells, value)
+
+            fresh = type(self.graph)(self.game_map.grid, self.graph.anchors)
+            self.assertEqual(self.graph.nodes, fresh.nodes)
+            self.assertEqual(set(self.graph.edges), set(fresh.edges))
+            for key, corridor in fresh.edges.items():
+                self.assertEqual(self.graph.edges[key].cells, corridor.cells)
+            self.assertEqual(self.graph.cell_edge, fresh.cell_edge)
+
+    def test_agent_plans_over_corridors(self):
+        """Test that the agent searches the junction graph on mazes with long corridors."""
+        config = {"map_size": 41, "cell_size": 10, "map_seed": 4, "map_cache": False,
+                  "maze_algorithm": "kruskal"}
+        game_map = GameMap(config)
+        self.assertTrue(worth_contracting(game_map.grid == 0))
+        agent = AIAgent(game_map, config, load_sprite=False)
+        agent.start_movement()
+        self.assertIsNotNone(game_map.get_junction_graph(build=False))
+        passable = game_map.get_passable_mask()
+        self.assertEqual(len(agent.path), len(astar(passable, game_map.start_pos, game_map.end_positions)))
+
+        # A background plan builds its own graph, which the map then keeps
+        background_map = GameMap(config)
+        background = AIAgent(background_map, config, load_sprite=False)
+        background.start_movement(background=True)
+        background._plan_future.result(timeout=30)
+        background.update(0.0)
+        self.assertEqual(len(background.path), len(agent.path))
+        self.assertIsNotNone(background_map.get_junction_graph(build=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,299 @@
+"""
+Tests for the maze map and surveillance cameras.
+"""
+import os
+import unittest
+import random
+import tempfile
+import numpy as np
+import pygame
+from src.game.map import GameMap, get_cone_sprite
+from src.game.map_corpus import MapCorpus
+from src.game.map_pool import MapPool
+from src.game.fov import compute_fov_mask, raycast_fov_mask, line_of_sight
+from src.utils.sim_clock import SimulationClock
+
+
+class TestGameMap(unittest.TestCase):
+    def setUp(self):
+        random.seed(1234)
+        self.config = {
+            "map_size": 20,
+            "cell_size": 25
+        }
+        self.game_map = GameMap(self.config)
+
+    def _wall_positions(self):
+        return [(x, y) for x in range(self.game_map.size)
+                for y in range(self.game_map.size)
+                if self.game_map.grid[x][y] == 1]
+
+    def test_camera_visibility_mask(self):
+        """Test that can_see reads the precomputed visibility mask."""
+        x, y = self._wall_positions()[40]
+        self.assertTrue(self.game_map.add_camera((x, y)))
+        camera = self.game_map.cameras[-1]
+
+        mask = camera.visibility_mask
+        self.assertEqual(mask.shape, self.game_map.grid.shape)
+        self.assertFalse(mask[x + camera.vision_range + 1:, :].any())
+
+        for cx in range(self.game_map.size):
+            for cy in range(self.game_map.size):
+                self.assertEqual(camera.can_see(cx, cy, self.game_map), bool(mask[cx, cy]))
+
+        # Resting cameras see nothing
+        camera.active = False
+        self.assertFalse(camera.can_see(x, y, self.game_map))
+
+    def test_camera_mask_rebuilt_on_grid_change(self):
+        """Test that masks are rebuilt when the grid changes."""
+        x, y = self._wall_positions()[40]
+        self.game_map.add_camera((x, y))
+        camera = self.game_map.cameras[-1]
+
+        # Opening the whole map leaves nothing to block the camera
+        self.game_map.grid[:, :] = 0
+        self.game_map.grid_version += 1
+        mask = camera.get_visibility_mask(self.game_map)
+
+        # With nothing in the way the mask is the 90 degree cone facing right
+        r = camera.vision_range
+        for cx in range(self.game_map.size):
+            for cy in range(self.game_map.size):
+                dx, dy = cx - x, cy - y
+                expected = dx ** 2 + dy ** 2 <= r ** 2 and dy >= abs(dx)
+                self.assertEqual(bool(mask[cx, cy]), expected)
+        self.assertIs(mask, camera.visibility_mask)
+
+    def test_rotation_changes_coverage(self):
+        """Test that the vision cone follows the camera direction."""
+        self.game_map.grid[:, :] = 0
+        self.game_map.grid_version += 1
+        self.game_map.grid[10][10] = 1
+        self.assertTrue(self.game_map.add_camera((10, 10)))
+        camera = self.game_map.cameras[-1]
+
+        self.assertTrue(self.game_map.is_covered(10, 12))
+        self.assertFalse(self.game_map.is_covered(12, 10))
+
+        camera.rotate()  # Now facing down
+        self.assertFalse(self.game_map.is_covered(10, 12))
+        self.assertTrue(self.game_map.is_covered(12, 10))
+
+    def test_walls_block_vision(self):
+        """Test that barriers hide the cells behind them."""
+        self.game_map.grid[:, :] = 0
+        self.game_map.grid[10][10] = 1
+        self.game_map.grid[10][12] = 1
+        self.game_map.grid_version += 1
+        self.game_map.add_camera((10, 10))
+        camera = self.game_map.cameras[-1]
+
+        self.assertTrue(camera.can_see(10, 11, self.game_map))
+        self.assertTrue(camera.can_see(10, 12, self.game_map))
+        self.assertFalse(camera.can_see(10, 13, self.game_map))
+
+    def test_coverage_tracks_camera_state(self):
+        """Test that the coverage layer follows placement, rest and rotation."""
+        walls = self._wall_positions()
+        for pos in walls[30:60:5]:
+            self.game_map.add_camera(pos)
+
+        def expected_coverage():
+            coverage = np.zeros_like(self.game_map.coverage)
+            for camera in self.game_map.cameras:
+                if camera.active:
+                    coverage += camera.get_visibility_mask(self.game_map)
+            return coverage
+
+        np.testing.assert_array_equal(self.game_map.coverage, expected_coverage())
+
+        camera = self.game_map.cameras[0]
+        camera.set_active(False)
+        np.testing.assert_array_equal(self.game_map.coverage, expected_coverage())
+
+        self.game_map.cameras[1].rotate()
+        camera.set_active(True)
+        np.testing.assert_array_equal(self.game_map.coverage, expected_coverage())
+
+        x, y = camera.x, camera.y
+        self.assertEqual(
+            self.game_map.is_covered(x, y),
+            any(cam.can_see(x, y, self.game_map) for cam in self.game_map.cameras)
+        )
+
+    def test_camera_without_cycle_keeps_scanning(self):
+        """Test that a camera with no scan or rest time stays on instead of hanging."""
+        clock = SimulationClock()
+        config = dict(self.config, camera_scan_time=0, camera_rest_time=0)
+        game_map = GameMap.from_grid(self.game_map.grid, config, clock=clock)
+        game_map.add_camera(self._wall_positions()[40])
+        camera = game_map.cameras[-1]
+        for _ in range(3):
+            clock.advance(0.5)
+            camera.update()
+            self.assertTrue(camera.active)
+        self.assertTrue(camera.is_active_at(1.25))
+
+    def test_raycast_engine(self):
+        """Test the ray table engine against the shadowcasting engine."""
+        grid = np.zeros((15, 15), dtype=np.uint8)
+        for direction in (0, 90, 180, 270):
+            np.testing.assert_array_equal(
+                raycast_fov_mask(grid, (7, 7), 4, direction, 90),
+                compute_fov_mask(grid, (7, 7), 4, direction, 90)
+            )
+
+        grid[7, 9] = 1
+        self.assertTrue(line_of_sight(grid, (7, 7), (7, 9), 4))
+        self.assertFalse(line_of_sight(grid, (7, 7), (7, 10), 4))
+        self.assertFalse(line_of_sight(grid, (7, 7), (7, 12), 4))  # Out of range
+        self.assertFalse(raycast_fov_mask(grid, (7, 7), 4)[7, 10])
+
+    def test_coverage_phases(self):
+        """Test the bit-packed coverage predicted over the scan/rest cycle."""
+        x, y = self._wall_positions()[40]
+        self.game_map.add_camera((x, y))
+        camera = self.game_map.cameras[-1]
+        camera.timer = 1.0  # Two seconds of scanning left
+
+        phases, period = self.game_map.get_coverage_phases(0.5)
+        self.assertEqual(period, 8)
+        self.assertEqual(phases.shape, (8, self.game_map.size, (self.game_map.size + 7) // 8))
+
+        mask = camera.visibility_mask
+        unpacked = np.unpackbits(phases, axis=2)[:, :, :self.game_map.size].astype(bool)
+        for t in range(period):
+            resting = 4 <= t < 6  # Rests for one second after scanning
+            expected = np.zeros_like(mask) if resting else mask
+            np.testing.assert_array_equal(unpacked[t], expected)
+
+        # No exact period: a cycle that is not a whole number of steps, or one that is too long
+        self.assertIsNone(self.game_map.get_coverage_phases(0.3)[0])
+        self.assertEqual(self.game_map.get_coverage_phases(0.5, max_period=4), (None, 8))
+
+    def test_maze_algorithms(self):
+        """Test that every maze algorithm gives a map with a route to the exit."""
+        for algorithm in ("division", "kruskal", "wilson"):
+            random.seed(3)
+            game_map = GameMap({"map_size": 41, "cell_size": 10, "maze_algorithm": algorithm})
+            self.assertTrue(game_map.has_valid_path())
+            self.assertTrue((game_map.grid[[0, -1], :] == 1).all())
+            self.assertTrue((game_map.grid[:, [0, -1]] == 1).all())
+
+        # Spanning tree algorithms join every lattice cell exactly once
+        rows, cols = game_map._lattice_shape()
+        for passages in (game_map._kruskal_passages(), game_map._wilson_passages()):
+            self.assertEqual(len(passages[0]), rows * cols - 1)
+
+    def test_seeded_maps_are_cached(self):
+        """Test that a seed reproduces a map and reloads it from the cache."""
+        with tempfile.TemporaryDirectory() as directory:
+            config = {"map_size": 25, "cell_size": 10, "map_cache_dir": directory}
+            first = GameMap(config, seed=42)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            random.seed(0)  # The global random state must not matter
+            cached = GameMap(config, seed=42)
+            np.testing.assert_array_equal(first.grid, cached.grid)
+            self.assertEqual(first.location_positions, cached.location_positions)
+            self.assertEqual(first.end_positions, cached.end_positions)
+
+            fresh = GameMap(dict(config, map_cache=False), seed=42)
+            np.testing.assert_array_equal(first.grid, fresh.grid)
+            self.assertEqual(first.location_positions, fresh.location_positions)
+
+    def test_map_corpus(self):
+        """Test that corpus maps round-trip through the bit-packed file."""
+        self.assertEqual(self.game_map.grid.dtype, np.uint8)
+        with tempfile.TemporaryDirectory() as directory:
+            config = {"map_size": 21, "cell_size": 10, "map_cache": False}
+            corpus = MapCorpus.build(os.path.join(directory, "corpus.npy"), config, 3, first_seed=7)
+            self.assertEqual(corpus.grids.shape, (3, 21, 3))
+
+            reopened = MapCorpus(corpus.path)
+            self.assertEqual(len(reopened), 3)
+            game_map = reopened.load_map(1, config)
+            np.testing.assert_array_equal(game_map.grid, GameMap(config, seed=8).grid)
+            self.assertEqual(game_map.start_pos, (1, 1))
+            self.assertEqual(game_map.end_positions, [(19, 19)])
+            del corpus, reopened
+
+    def test_map_pool(self):
+        """Test that pooled maps follow consecutive seeds with the static layer drawn."""
+        config = {"map_size": 21, "cell_size": 10, "map_cache": False, "colors": {"street": (150, 150, 150)}}
+        pool = MapPool(config, count=2, next_seed=4)
+        try:
+            for seed in (4, 5, 6):
+                game_map = pool.take()
+                self.assertEqual(game_map.seed, seed)
+                np.testing.assert_array_equal(game_map.grid, GameMap(config, seed=seed).grid)
+                self.assertIsNotNone(game_map._static_surface)
+            self.assertEqual(len(pool._pending), 2)
+        finally:
+            pool.shutdown()
+
+    def test_camera_spatial_index(self):
+        """Test camera lookups by cell and by range against a scan of every camera."""
+        walls = [(x, y) for x in range(1, 19) for y in range(1, 19) if self.game_map.grid[x][y] == 1]
+        for i, wall in enumerate(walls[::3]):
+            self.assertTrue(self.game_map.add_camera(wall))
+            for _ in range(i % 4):
+                self.game_map.cameras[-1].rotate()
+        self.assertFalse(self.game_map.add_camera(walls[0]))
+        self.assertEqual(self.game_map.find_camera(walls[3]), 1)
+        self.assertIsNone(self.game_map.find_camera(walls[1]))
+
+        for x in range(self.game_map.size):
+            for y in range(self.game_map.size):
+                near = [c for c in self.game_map.cameras
+                        if max(abs(c.x - x), abs(c.y - y)) <= c.vision_range]
+                self.assertCountEqual(self.game_map.cameras_near(x, y), near)
+                watching = [c for c in self.game_map.cameras if c.can_see(x, y, self.game_map)]
+                self.assertCountEqual(self.game_map.watching_cameras(x, y), watching)
+                self.assertEqual(bool(watching), self.game_map.is_covered(x, y))
+
+    def test_static_layer_cached(self):
+        """Test that the maze layer is drawn once and redrawn after grid changes."""
+        self.game_map.config["colors"] = {"street": (150, 150, 150)}
+        size = self.game_map.size * self.game_map.cell_size
+        screen = pygame.Surface((size, size))
+        self.game_map.render(screen)
+        static = self.game_map._static_surface
+        self.assertEqual(static.get_size(), (size, size))
+
+        # Wall cells are blue-gray inside their grid line outline
+        x, y = self._wall_positions()[40]
+        cell = self.game_map.cell_size
+        self.assertEqual(tuple(static.get_at((y * cell + 2, x * cell + 2)))[:3], (50, 50, 150))
+
+        self.game_map.render(screen)
+        self.assertIs(self.game_map._static_surface, static)
+        self.game_map.set_cells([(x, y)], 0)
+        self.game_map.render(screen)
+        self.assertIsNot(self.game_map._static_surface, static)
+
+    def test_vision_overlay_cached(self):
+        """Test that cone sprites are shared and the overlay follows camera state."""
+        self.game_map.config["colors"] = {"street": (150, 150, 150)}
+        walls = self._wall_positions()
+        for pos in walls[30:60:10]:
+            self.game_map.add_camera(pos)
+
+        overlay = self.game_map._get_vision_overlay()
+        self.assertIs(self.game_map._get_vision_overlay(), overlay)
+        first, second = self.game_map.cameras[:2]
+        self.assertIs(
+            get_cone_sprite(first.vision_range, first.direction, first.vision_angle, 25, (255, 200, 200, 100)),
+            get_cone_sprite(second.vision_range, second.direction, second.vision_angle, 25, (255, 200, 200, 100))
+        )
+
+        first.set_active(False)
+        rebuilt = self.game_map._get_vision_overlay()
+        self.assertIsNot(rebuilt, overlay)
+        self.assertIs(self.game_map._get_vision_overlay(), rebuilt)
+
+
+if __name__ == "__main__":
+    unittest.main()
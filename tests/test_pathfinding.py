@@ -0,0 +1,182 @@
+"""
+Tests for grid pathfinding.
+"""
+import unittest
+from collections import deque
+import numpy as np
+from src.game.pathfinding import (
+    astar, distance_field, follow_distance_field, min_exposure_path, path_exposure,
+    space_time_search, DStarLite
+)
+from src.game.hpa import ClusterGraph
+
+
+def bfs_length(passable, start, goals):
+    """Reference BFS returning the number of cells on a shortest path."""
+    height, width = passable.shape
+    queue = deque([(start, 1)])
+    visited = {start}
+    while queue:
+        (x, y), length = queue.popleft()
+        if (x, y) in goals:
+            return length
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if (0 <= nx < height and 0 <= ny < width and passable[nx, ny]
+                    and (nx, ny) not in visited):
+                visited.add((nx, ny))
+                queue.append(((nx, ny), length + 1))
+    return 0
+
+
+class TestPathfinding(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.grids = [rng.random((25, 25)) > 0.3 for _ in range(20)]
+        for grid in self.grids:
+            grid[1, 1] = True
+            grid[23, 23] = True
+            grid[1, 23] = True
+
+    def assertValidPath(self, path, passable, start, goals):
+        self.assertEqual(path[0], start)
+        self.assertIn(path[-1], goals)
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            self.assertEqual(abs(x1 - x2) + abs(y1 - y2), 1)
+            self.assertTrue(passable[x2, y2])
+
+    def test_astar_is_shortest(self):
+        """Test that A* finds paths as short as BFS."""
+        goals = [(23, 23), (1, 23)]
+        for grid in self.grids:
+            path = astar(grid, (1, 1), goals)
+            self.assertEqual(len(path), bfs_length(grid, (1, 1), goals))
+            if path:
+                self.assertValidPath(path, grid, (1, 1), goals)
+
+    def test_astar_no_path(self):
+        """Test that an unreachable exit returns an empty path."""
+        grid = np.ones((10, 10), dtype=bool)
+        grid[:, 5] = False
+        self.assertEqual(astar(grid, (1, 1), [(8, 8)]), [])
+        self.assertEqual(astar(grid, (1, 1), []), [])
+
+    def test_distance_field(self):
+        """Test that following the exit distance field gives shortest paths."""
+        goals = [(23, 23), (1, 23)]
+        for grid in self.grids:
+            field = distance_field(grid, goals)
+            path = follow_distance_field(field, (1, 1))
+            self.assertEqual(len(path), bfs_length(grid, (1, 1), goals))
+            if path:
+                self.assertEqual(field[1, 1], len(path) - 1)
+                self.assertValidPath(path, grid, (1, 1), goals)
+            else:
+                self.assertEqual(field[1, 1], -1)
+
+    def test_dstar_lite_repairs_after_changes(self):
+        """Test that incremental repairs match a fresh search."""
+        rng = np.random.default_rng(11)
+        goals = [(23, 23), (1, 23)]
+        for seeded in (False, True):
+            grid = self.grids[0].copy()
+            planner = DStarLite(grid, goals, (1, 1),
+                                distances=distance_field(grid, goals) if seeded else None)
+            pos = (1, 1)
+            for _ in range(15):
+                path = planner.extract_path()
+                self.assertEqual(len(path), bfs_length(grid, pos, goals))
+                if len(path) > 2:
+                    pos = path[2]
+                    planner.move_start(pos)
+
+                flips = rng.integers(1, 24, size=(6, 2))
+                for x, y in flips:
+                    if (x, y) != pos and (x, y) not in goals:
+                        grid[x, y] = not grid[x, y]
+                planner.update_passable(grid)
+
+    def test_space_time_search_waits_for_rest(self):
+        """Test that the timed planner waits for a camera to rest."""
+        street = np.zeros((3, 10), dtype=bool)
+        street[1, 1:9] = True
+        period = 6
+        covered = np.zeros((period, 3, 10), dtype=bool)
+        covered[2:5, 1, 5] = True  # Watched for half of each cycle
+        phases = np.packbits(covered, axis=2)
+
+        path = space_time_search(street, phases, (1, 1), [(1, 8)])
+        self.assertEqual(path[0], (1, 1))
+        self.assertEqual(path[-1], (1, 8))
+        for t, (x, y) in enumerate(path[1:], start=1):
+            self.assertFalse(covered[t % period, x, y])
+            self.assertFalse(covered[(t + 1) % period, x, y])
+        # A straight walk would cross the camera while it scans
+        self.assertGreater(len(path), 8)
+
+        # A camera that never rests blocks the corridor
+        covered[:, 1, 5] = True
+        self.assertEqual(space_time_search(street, np.packbits(covered, axis=2), (1, 1), [(1, 8)]), [])
+
+        # Starting in view is never a hidden route
+        covered[:, 1, 5] = False
+        covered[1, 1, 1] = True
+        self.assertEqual(space_time_search(street, np.packbits(covered, axis=2), (1, 1), [(1, 8)]), [])
+
+    def test_min_exposure_path(self):
+        """Test that the least-watched route is chosen when none is hidden."""
+        street = np.zeros((7, 9), dtype=bool)
+        street[1, 1:8] = True  # Short corridor watched by two cameras
+        street[5, 1:8] = True  # Long corridor watched by one camera
+        street[1:6, 1] = True
+        street[1:6, 7] = True
+        coverage = np.zeros((7, 9), dtype=np.int32)
+        coverage[1, 4] = 2
+        coverage[5, 4] = 1
+
+        self.assertEqual(astar(street & (coverage == 0), (1, 1), [(1, 7)]), [])
+        path = min_exposure_path(street, coverage, (1, 1), [(1, 7)])
+        self.assertEqual(path_exposure(coverage, path), 1)
+        self.assertIn((5, 4), path)
+
+        # Without any cameras it is a plain shortest path
+        path = min_exposure_path(street, np.zeros_like(coverage), (1, 1), [(1, 7)])
+        self.assertEqual(len(path), 7)
+
+    def test_hierarchical_path(self):
+        """Test HPA* paths and that local updates match a fresh cluster graph."""
+        rng = np.random.default_rng(5)
+        grid = rng.random((60, 60)) > 0.25
+        grid[1, 1] = grid[58, 58] = True
+        goals = [(58, 58)]
+
+        graph = ClusterGraph(grid, cluster_size=8)
+        waypoints = graph.find_path((1, 1), goals)
+        if astar(grid, (1, 1), goals):
+            path = [(1, 1)]
+            for segment in graph.refine(waypoints):
+                path.extend(segment)
+            self.assertValidPath(path, grid, (1, 1), goals)
+        else:
+            self.assertEqual(waypoints, [])
+
+        # Starting on an entrance node, in a corridor crossing several clusters
+        corridor = np.zeros((8, 20), dtype=bool)
+        corridor[1, :] = True
+        corridor_graph = ClusterGraph(corridor, cluster_size=4)
+        for start in [(1, 3), (1, 7)]:
+            path = [start]
+            for segment in corridor_graph.refine(corridor_graph.find_path(start, [(1, 19)])):
+                path.extend(segment)
+            self.assertValidPath(path, corridor, start, [(1, 19)])
+            self.assertEqual(len(path), len(astar(corridor, start, [(1, 19)])))
+
+        grid[20:30, 20:30] = False
+        graph.update(grid, [(20, 20, 29, 29)])
+        fresh = ClusterGraph(grid, cluster_size=8)
+        self.assertEqual(graph.transitions, fresh.transitions)
+        self.assertEqual(graph.nodes, fresh.nodes)
+
+
+if __name__ == "__main__":
+    unittest.main()
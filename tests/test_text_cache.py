@@ -0,0 +1,29 @@
+"""
+Tests for the rendered text cache.
+"""
+import unittest
+import pygame
+from src.utils.text_cache import TextCache
+
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        pygame.font.init()
+        self.font = pygame.font.Font(None, 24)
+
+    def test_reuses_and_evicts_surfaces(self):
+        """Test that repeated text is rasterized once and old entries are evicted."""
+        cache = TextCache(max_size=2)
+        first = cache.render(self.font, "Camera", True, (0, 0, 0))
+        self.assertIs(cache.render(self.font, "Camera", True, (0, 0, 0)), first)
+        self.assertIsNot(cache.render(self.font, "Camera", True, (255, 0, 0)), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        # "Camera" in black is now least recently used
+        cache.render(self.font, "Map", True, (0, 0, 0))
+        self.assertEqual(len(cache.surfaces), 2)
+        self.assertIsNot(cache.render(self.font, "Camera", True, (0, 0, 0)), first)
+
+
+if __name__ == "__main__":
+    unittest.main()